@@ -1,13 +1,25 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .database import engine, Base
-from .routers import auth, trips, admin
+from .routers import auth, trips, admin, media
+from .migrations import run_migrations
+from .middleware import BodySizeLimitMiddleware
+from .services.fuel_images import FUEL_UPLOAD_MAX_BODY_BYTES
 
-# Create tables on startup
+# Create tables on startup, then add columns/indexes introduced since
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(title="Driver Trip Tracker")
 
+# Refuse oversized fuel photo uploads before Starlette spools them to disk.
+# Added before CORS so its 413 responses still carry CORS headers
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    path_pattern=r"^/trips/\d+/fuel$",
+    max_bytes=FUEL_UPLOAD_MAX_BODY_BYTES
+)
+
 # CORS
 origins = [
     "http://localhost",
@@ -27,13 +39,14 @@ app.add_middleware(
 app.include_router(auth.router)
 app.include_router(trips.router)
 app.include_router(admin.router)
+app.include_router(media.router)
 
-from fastapi.staticfiles import StaticFiles
+from .static_files import CachedStaticFiles
 import os
 
 # Ensure static directory exists
 os.makedirs("app/static", exist_ok=True)
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
 
 @app.get("/")
 def read_root():
@@ -72,6 +85,22 @@ def startup_event():
     finally:
         db.close()
 
+    try:
+        from .services import live_positions
+        db = SessionLocal()
+        try:
+            live_positions.rebuild(db)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Failed to load live positions: {e}")
+
+    try:
+        from .services.geocoding import start_worker
+        start_worker()
+    except Exception as e:
+        print(f"Failed to start geocoding worker: {e}")
+
     try:
         from .services.scheduler import init_scheduler
         init_scheduler()
@@ -0,0 +1,73 @@
+"""
+ASGI middleware shared by the routers.
+"""
+import re
+from starlette.responses import JSONResponse
+
+class BodyTooLarge(Exception):
+    pass
+
+class BodySizeLimitMiddleware:
+    """
+    Refuse request bodies over `max_bytes` on paths matching `path_pattern`
+    with a 413, before the route reads them. A declared Content-Length is
+    checked up front; chunked bodies are counted as they arrive.
+    """
+
+    def __init__(self, app, path_pattern: str, max_bytes: int):
+        self.app = app
+        self.path_pattern = re.compile(path_pattern)
+        self.max_bytes = max_bytes
+
+    def too_large(self):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds {self.max_bytes // (1024 * 1024)} MB"}
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.path_pattern.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    await self.too_large()(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                # Whatever error the route made of the aborted body is replaced by the 413
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except BodyTooLarge:
+            if response_started:
+                raise
+        if exceeded and not response_started:
+            await self.too_large()(scope, receive, send)
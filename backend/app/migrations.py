@@ -0,0 +1,57 @@
+"""
+Minimal additive schema migrations.
+
+Base.metadata.create_all only creates missing tables, so new nullable columns
+and indexes declared on existing models are added here on startup.
+"""
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+# Run once before an index is first created, e.g. to remove rows a new unique index would reject
+INDEX_PREPARATION = {
+    "uq_trip_breadcrumbs_trip_time": [
+        # The derived table lets MySQL read the table it deletes from
+        "DELETE FROM trip_breadcrumbs WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MIN(id) AS id FROM trip_breadcrumbs GROUP BY trip_id, timestamp) AS keep_rows)",
+    ],
+}
+
+# Indexes dropped once the index that supersedes them exists: {new name: old name}
+REPLACED_INDEXES = {
+    "uq_trip_breadcrumbs_trip_time": "ix_trip_breadcrumbs_trip_time",
+}
+
+def run_migrations(engine):
+    """Add any model columns and indexes that are missing from existing tables."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+                logger.info(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                for statement in INDEX_PREPARATION.get(index.name, []):
+                    conn.exec_driver_sql(statement)
+                index.create(conn)
+                logger.info(f"Created index {index.name}")
+
+                replaced = REPLACED_INDEXES.get(index.name)
+                if replaced in existing_indexes:
+                    on_table = f" ON {table.name}" if engine.dialect.name == "mysql" else ""
+                    conn.exec_driver_sql(f"DROP INDEX {replaced}{on_table}")
+                    logger.info(f"Dropped index {replaced}, superseded by {index.name}")
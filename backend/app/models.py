@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Float, Date, DateTime, ForeignKey, Enum, Index, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -72,11 +73,22 @@ class Trip(Base):
     estimated_trip_time = Column(String(50), nullable=True) # e.g. "18:00:00"
     destination_city = Column(String(100), nullable=True)
 
+    # Running total of the distance between consecutive logs, maintained on log writes
+    distance_km = Column(Float, default=0.0, nullable=True)
+
+    # Bumped on every change; lets exports detect whether a date range is stale
+    updated_at = Column(DateTime, default=now_saudi, onupdate=now_saudi, nullable=True, index=True)
+
     driver = relationship("User", back_populates="trips")
     car = relationship("Car")
     logs = relationship("TripLog", back_populates="trip")
     fuel_logs = relationship("FuelLog", back_populates="trip")
 
+    __table_args__ = (
+        # Driver history: equality on driver and status, range and order on start_date
+        Index("ix_trips_driver_status_start", "driver_id", "status", "start_date"),
+    )
+
 class TripLog(Base):
     __tablename__ = "trip_logs"
 
@@ -96,7 +108,7 @@ class FuelLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id"))
     driver_id = Column(Integer, ForeignKey("users.id"))
-    timestamp = Column(DateTime, default=now_saudi)
+    timestamp = Column(DateTime, default=now_saudi, index=True)
     amount_liters = Column(Float, nullable=True)
     indicator_image_url = Column(String(255), nullable=True)
     machine_image_url = Column(String(255), nullable=True)
@@ -107,6 +119,67 @@ class FuelLog(Base):
     trip = relationship("Trip", back_populates="fuel_logs")
     driver = relationship("User")
 
+class TripBreadcrumb(Base):
+    """
+    GPS position reported while a trip is in progress.
+    Append-only and deliberately narrow: rows are bulk-inserted in batches and
+    never updated, so the table has no relationships or extra indexes. The
+    unique key makes re-sent points no-ops whichever worker receives them.
+    """
+    __tablename__ = "trip_breadcrumbs"
+    __table_args__ = (
+        Index("uq_trip_breadcrumbs_trip_time", "trip_id", "timestamp", unique=True),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    trip_id = Column(Integer, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    speed_kmh = Column(Float, nullable=True)
+
+class TripTrack(Base):
+    """Precomputed path of a completed trip with per-point simplification tolerances (see services.tracks)."""
+    __tablename__ = "trip_tracks"
+
+    trip_id = Column(Integer, ForeignKey("trips.id"), primary_key=True, autoincrement=False)
+    point_count = Column(Integer)
+    # Packed numpy records; BLOB is capped at 64 KB on MySQL
+    data = Column(LargeBinary().with_variant(LONGBLOB, "mysql"))
+    computed_at = Column(DateTime, default=now_saudi)
+    # Layout of `data`; rows written by an older layout are recomputed on read
+    format_version = Column(Integer, nullable=True)
+
+class CarDailyStat(Base):
+    """Per-car, per-day rollup of completed trips and fuel refills for reports."""
+    __tablename__ = "car_daily_stats"
+
+    car_id = Column(Integer, ForeignKey("cars.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    distance_km = Column(Float, default=0.0)
+    refill_liters = Column(Float, default=0.0)
+    refill_count = Column(Integer, default=0)
+    trip_count = Column(Integer, default=0)
+
+class GeocodeCell(Base):
+    """Reverse-geocoded address of a rounded coordinate cell (see services.geocoding)."""
+    __tablename__ = "geocode_cells"
+
+    lat_cell = Column(Integer, primary_key=True, autoincrement=False)
+    lon_cell = Column(Integer, primary_key=True, autoincrement=False)
+    address = Column(String(255))
+    created_at = Column(DateTime, default=now_saudi)
+
+class IdempotencyRecord(Base):
+    """Stored response of a write request, replayed when a client retries with the same Idempotency-Key."""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(64), primary_key=True)
+    endpoint = Column(String(50))
+    response = Column(Text)
+    expires_at = Column(DateTime, index=True)
+
 class SystemSetting(Base):
     __tablename__ = "system_settings"
 
@@ -0,0 +1,54 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+Rows are ordered by a unique integer column, newest first, and the cursor is
+the last key of the previous page, so every page is a single index range scan
+no matter how deep into the history it is.
+"""
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def keyset_paginate(query, key_column, cursor=None, limit=50):
+    """
+    Return {"items": [...], "next_cursor": int|None} for one page of `query`.
+    `key_column` must be unique (usually the primary key) and exposed on each row as `.id`.
+    """
+    if cursor:
+        query = query.filter(key_column < cursor)
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(key_column.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
+
+def encode_timestamp_cursor(timestamp, row_id) -> str:
+    return f"{timestamp.isoformat()}_{row_id}"
+
+
+def decode_timestamp_cursor(cursor: str):
+    """Split a "<iso timestamp>_<id>" cursor; raises ValueError when malformed."""
+    timestamp, row_id = cursor.rsplit("_", 1)
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+
+def timestamp_keyset_paginate(query, timestamp_column, id_column, cursor=None, limit=50):
+    """
+    Like keyset_paginate, but ordered by (timestamp, id) descending for tables
+    where rows are not inserted in time order. The cursor is an opaque
+    "<iso timestamp>_<id>" string; rows must expose `.id` and an attribute
+    named after `timestamp_column` (e.g. `.timestamp` or `.start_date`).
+    """
+    if cursor:
+        cursor_ts, cursor_id = decode_timestamp_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < cursor_ts,
+            and_(timestamp_column == cursor_ts, id_column < cursor_id)
+        ))
+
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_timestamp_cursor(getattr(last, timestamp_column.key), last.id)
+    return {"items": rows[:limit], "next_cursor": next_cursor}
@@ -1,22 +1,37 @@
 from fastapi import UploadFile, File
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload, selectinload
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import Date, func
+from sqlalchemy.orm import Session, joinedload, selectinload, aliased
+from fastapi.responses import StreamingResponse, FileResponse
 from typing import List, Optional
-from datetime import datetime
-import pandas as pd
-from io import BytesIO
+from datetime import datetime, timedelta
 from .. import database, models, schemas
 from ..timezone import ensure_saudi_naive, now_saudi
 from ..utils import calculate_trip_distance, estimate_fuel_consumption
-from .auth import get_current_user
+from ..pagination import keyset_paginate, timestamp_keyset_paginate
+from ..cache import TTLCache
+from .auth import (
+    get_current_user, resolve_user, invalidate_cached_user, user_cache,
+    create_live_feed_ticket, LIVE_FEED_TICKET_SCOPE, LIVE_FEED_TICKET_EXPIRE_SECONDS
+)
 from ..services.backup import create_backup, restore_backup, get_backup_list
 from ..services.scheduler import update_backup_schedule
+from ..services.export import (
+    ExportFormat, build_xlsx, build_parquet, stream_csv, iter_file,
+    XLSX_MEDIA_TYPE, CSV_MEDIA_TYPE, GZIP_MEDIA_TYPE, PARQUET_MEDIA_TYPE
+)
+from ..services import geocoding, hashing, live_feed, live_positions, tracks
+from ..services.rollup import trip_rollup_keys, driver_rollup_keys, refresh_keys
+from ..services.export_jobs import submit_export_job, get_job, ExportJobStatus
+import os
 import asyncio
 from fastapi.concurrency import run_in_threadpool
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+LIVE_FEED_KEEPALIVE_SECONDS = 15
+LIVE_FEED_RETRY_MS = 5000
+
 # Global lock to prevent concurrent mysqldump/restore operations
 backup_lock = asyncio.Lock()
 
@@ -24,15 +39,150 @@ def check_admin(user: models.User):
     if user.role != models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin privileges required")
 
-@router.get("/trips", response_model=List[schemas.Trip])
-def get_all_trips(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def parse_date_range(start_date: Optional[str], end_date: Optional[str]):
+    """
+    Parse YYYY-MM-DD filter strings into a half-open [start, end) datetime range.
+    Invalid dates are ignored, matching the export's historical behaviour.
+    """
+    start_dt = end_dt = None
+    if start_date:
+        try:
+            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+        except ValueError:
+            pass # Ignore invalid date format
+    if end_date:
+        try:
+            # Exclusive upper bound: the day after end_date
+            end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        except ValueError:
+            pass # Ignore invalid date format
+    return start_dt, end_dt
+
+def apply_trip_filters(query, driver_id=None, start_date=None, end_date=None, status=None, car_id=None):
+    """Apply the shared admin trip filters (driver, car, status, start_date range) to a query."""
+    if driver_id:
+        query = query.filter(models.Trip.driver_id == driver_id)
+    if car_id:
+        query = query.filter(models.Trip.car_id == car_id)
+    if status:
+        query = query.filter(models.Trip.status == status)
+
+    start_dt, end_dt = parse_date_range(start_date, end_date)
+    if start_dt:
+        query = query.filter(models.Trip.start_date >= start_dt)
+    if end_dt:
+        query = query.filter(models.Trip.start_date < end_dt)
+    return query
+
+@router.get("/trips", response_model=schemas.TripPage)
+def get_all_trips(
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    status: Optional[models.TripStatus] = None,
+    driver_id: Optional[int] = None,
+    car_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Keyset-paginated trip list, newest first.
+    Pass the returned next_cursor back as `cursor` to fetch the following page.
+    """
     check_admin(current_user)
-    trips = db.query(models.Trip).options(
+    query = db.query(models.Trip).options(
         joinedload(models.Trip.driver),
         joinedload(models.Trip.car),
         selectinload(models.Trip.logs)
-    ).order_by(models.Trip.id.desc()).all()
-    return trips
+    )
+    query = apply_trip_filters(query, driver_id, start_date, end_date, status=status, car_id=car_id)
+    return keyset_paginate(query, models.Trip.id, cursor, limit)
+
+# Columns read by the summary view; everything a table row needs lives on trips itself
+TRIP_SUMMARY_COLUMNS = (
+    models.Trip.id, models.Trip.driver_id, models.Trip.car_id,
+    models.Trip.start_date, models.Trip.status,
+    models.Trip.exit_factory_time, models.Trip.exit_factory_address,
+    models.Trip.arrive_warehouse_time, models.Trip.arrive_warehouse_address,
+    models.Trip.exit_warehouse_time, models.Trip.exit_warehouse_address,
+    models.Trip.arrive_factory_time, models.Trip.arrive_factory_address,
+    models.Trip.distance_km, models.Trip.waiting_reason, models.Trip.estimated_trip_time, models.Trip.destination_city,
+)
+
+@router.get("/trips/summary", response_model=schemas.TripSummaryPage)
+def get_trip_summaries(
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    status: Optional[models.TripStatus] = None,
+    driver_id: Optional[int] = None,
+    car_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Flat, table-row projection of trips for list views.
+    Reads only the flattened trip columns plus driver/plate names in one query,
+    without hydrating ORM objects or loading logs.
+    """
+    check_admin(current_user)
+    DriverCar = aliased(models.Car)
+    query = db.query(
+        *TRIP_SUMMARY_COLUMNS,
+        models.User.username.label("driver_name"),
+        func.coalesce(models.Car.plate, DriverCar.plate).label("car_plate"),
+    ).outerjoin(models.User, models.Trip.driver_id == models.User.id) \
+     .outerjoin(models.Car, models.Trip.car_id == models.Car.id) \
+     .outerjoin(DriverCar, models.User.car_id == DriverCar.id)
+    query = apply_trip_filters(query, driver_id, start_date, end_date, status=status, car_id=car_id)
+    return keyset_paginate(query, models.Trip.id, cursor, limit)
+
+# Shared by every open dashboard; live feed deltas keep the counters current in between
+trip_stats_cache = TTLCache(maxsize=1, ttl=60)
+
+@router.get("/trips/stats", response_model=schemas.TripStats)
+def get_trip_stats(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Trip counters for the dashboard, aggregated in SQL so it can show totals
+    without downloading the trip list.
+    """
+    check_admin(current_user)
+    stats = trip_stats_cache.get("all")
+    if stats is not None:
+        return stats
+
+    by_status = dict(db.query(models.Trip.status, func.count(models.Trip.id)).group_by(models.Trip.status).all())
+
+    # Per-day counts are few enough to roll up into months here, portably across databases
+    trip_day = func.date(models.Trip.start_date, type_=Date)
+    today = now_saudi().date()
+    months = {}
+    today_count = 0
+    for day, count in db.query(trip_day, func.count(models.Trip.id)).group_by(trip_day):
+        if day is None:
+            continue
+        months[(day.year, day.month)] = months.get((day.year, day.month), 0) + count
+        if day == today:
+            today_count = count
+
+    stats = schemas.TripStats(
+        total=sum(by_status.values()),
+        active=by_status.get(models.TripStatus.IN_PROGRESS, 0),
+        completed=by_status.get(models.TripStatus.COMPLETED, 0),
+        today=today_count,
+        this_month=months.get((today.year, today.month), 0),
+        monthly=[
+            schemas.MonthlyTripCount(year=year, month=month, count=count)
+            for (year, month), count in sorted(months.items(), reverse=True)
+        ]
+    )
+    trip_stats_cache.set("all", stats)
+    return stats
 
 @router.get("/cars", response_model=List[schemas.Car])
 def get_cars(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
@@ -110,6 +260,7 @@ def change_admin_password(payload: schemas.PasswordChange, current_user: models.
     from .auth import get_password_hash
     current_user.hashed_password = get_password_hash(payload.password)
     db.commit()
+    invalidate_cached_user(current_user.username)
     return {"message": "Password updated successfully"}
 
 @router.put("/drivers/{driver_id}", response_model=schemas.User)
@@ -120,6 +271,7 @@ def update_driver(driver_id: int, user: schemas.UserUpdate, current_user: models
         raise HTTPException(status_code=404, detail="Driver not found")
     
     update_data = user.dict(exclude_unset=True)
+    old_username = db_user.username
     
     if "username" in update_data:
         new_username = update_data["username"]
@@ -136,6 +288,7 @@ def update_driver(driver_id: int, user: schemas.UserUpdate, current_user: models
         db_user.hashed_password = get_password_hash(update_data["password"])
         
     db.commit()
+    invalidate_cached_user(old_username)
     db.refresh(db_user)
     return db_user
 
@@ -145,11 +298,88 @@ def delete_driver(driver_id: int, current_user: models.User = Depends(get_curren
     db_user = db.query(models.User).filter(models.User.id == driver_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="Driver not found")
-        
+
+    # Trips go with the driver through the ORM cascade; tracks, breadcrumbs and
+    # fuel logs have no cascade from it, so remove them first as delete_trip does
+    rollup_keys = driver_rollup_keys(db, driver_id)
+    trip_ids = [trip_id for (trip_id,) in db.query(models.Trip.id).filter(models.Trip.driver_id == driver_id)]
+    db.query(models.FuelLog).filter(models.FuelLog.driver_id == driver_id).delete(synchronize_session=False)
+    if trip_ids:
+        db.query(models.TripBreadcrumb).filter(models.TripBreadcrumb.trip_id.in_(trip_ids)).delete(synchronize_session=False)
+        for trip_id in trip_ids:
+            tracks.invalidate(db, trip_id)
+
     db.delete(db_user)
+    refresh_keys(db, rollup_keys)
     db.commit()
+    trip_stats_cache.clear()
+    invalidate_cached_user(db_user.username)
     return {"message": "Driver deleted successfully"}
 
+@router.post("/live-feed/ticket", response_model=schemas.LiveFeedTicket)
+def get_live_feed_ticket(current_user: models.User = Depends(get_current_user)):
+    """
+    Ticket for opening the live feed. EventSource cannot send an Authorization
+    header, so the feed is authenticated through the URL, and a ticket there
+    expires within a minute and is refused by every other route.
+    """
+    check_admin(current_user)
+    return {"ticket": create_live_feed_ticket(current_user), "expires_in": LIVE_FEED_TICKET_EXPIRE_SECONDS}
+
+def require_live_feed_admin(ticket: str):
+    """
+    Authenticate the live feed's query-string ticket. A sync dependency, so the
+    lookup runs in the threadpool, and with its own short session so none stays
+    open for the life of the stream.
+    """
+    db = database.SessionLocal()
+    try:
+        check_admin(resolve_user(ticket, db, scope=LIVE_FEED_TICKET_SCOPE))
+    finally:
+        db.close()
+
+@router.get("/live-feed", dependencies=[Depends(require_live_feed_admin)])
+async def live_feed_stream(request: Request):
+    """
+    Server-Sent Events stream of trip deltas (trip_started, trip_log, fuel_refill,
+    trip_updated, trip_deleted). Opened with a `ticket` query parameter from
+    POST /admin/live-feed/ticket; the ticket is only checked when connecting.
+    """
+    async def events():
+        queue = live_feed.broadcaster.subscribe()
+        try:
+            yield f"retry: {LIVE_FEED_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=LIVE_FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield live_feed.format_sse(message)
+        finally:
+            live_feed.broadcaster.unsubscribe(queue)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@router.get("/live-positions", response_model=List[schemas.LivePosition])
+def get_live_positions(current_user: models.User = Depends(get_current_user)):
+    """Latest state and position of every in-progress trip, served from memory."""
+    check_admin(current_user)
+    return live_positions.snapshot()
+
+@router.get("/metrics")
+def get_metrics(current_user: models.User = Depends(get_current_user)):
+    """In-process performance counters for this worker."""
+    check_admin(current_user)
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hashing": hashing.stats(),
+        "geocoding": geocoding.stats(),
+        "live_feed": live_feed.broadcaster.stats()
+    }
+
 @router.get("/drivers-list", response_model=List[schemas.User])
 def get_drivers(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
     check_admin(current_user)
@@ -157,6 +387,19 @@ def get_drivers(current_user: models.User = Depends(get_current_user), db: Sessi
     drivers = db.query(models.User).options(joinedload(models.User.car)).filter(models.User.role == models.UserRole.DRIVER).all()
     return drivers
 
+@router.get("/trips/{trip_id}", response_model=schemas.Trip)
+def get_trip(trip_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+    """One trip with its logs, e.g. to apply a live feed event the delta alone can't describe."""
+    check_admin(current_user)
+    trip = db.query(models.Trip).options(
+        joinedload(models.Trip.driver),
+        joinedload(models.Trip.car),
+        selectinload(models.Trip.logs)
+    ).filter(models.Trip.id == trip_id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return trip
+
 @router.put("/trips/{trip_id}", response_model=schemas.Trip)
 def update_trip(trip_id: int, trip_update: schemas.TripUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
     check_admin(current_user)
@@ -164,6 +407,9 @@ def update_trip(trip_id: int, trip_update: schemas.TripUpdate, current_user: mod
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
 
+    # Rollup rows the trip contributed to before the edit
+    rollup_keys = trip_rollup_keys(db, trip)
+
     if trip_update.driver_id is not None:
         trip.driver_id = trip_update.driver_id
     if trip_update.status is not None:
@@ -213,6 +459,9 @@ def update_trip(trip_id: int, trip_update: schemas.TripUpdate, current_user: mod
                 )
                 db.add(new_log)
 
+        # Log edits change exported cells even when no trip column changes
+        trip.updated_at = now_saudi()
+
         # 3. Re-sync flattened columns from ALL current logs (after changes)
         db.flush() # Ensure new logs have IDs if needed, though we query again
         all_logs = db.query(models.TripLog).filter(models.TripLog.trip_id == trip_id).all()
@@ -242,10 +491,43 @@ def update_trip(trip_id: int, trip_update: schemas.TripUpdate, current_user: mod
                 trip.arrive_factory_time = log.timestamp
                 trip.arrive_factory_address = log.address
 
+        # Timestamps may have been reordered, so recompute the distance from scratch
+        trip.distance_km = calculate_trip_distance(all_logs)
+
+    refresh_keys(db, rollup_keys | trip_rollup_keys(db, trip))
+    tracks.invalidate(db, trip_id)
     db.commit()
+    trip_stats_cache.clear()
     db.refresh(trip)
+    if trip.status == models.TripStatus.COMPLETED:
+        tracks.schedule_precompute(trip_id)
+    last_log = max(trip.logs, key=lambda log: (log.timestamp, log.id), default=None)
+    live_feed.publish(live_feed.trip_event("trip_updated", trip, last_log))
     return trip
 
+@router.get("/trips/{trip_id}/track", response_model=schemas.TripTrack)
+def get_trip_track(
+    trip_id: int,
+    zoom: int = Query(14, ge=0, le=22),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """Trip path simplified for a map at `zoom`; points under about a pixel off the line are dropped."""
+    check_admin(current_user)
+    trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    points = tracks.get_track(db, trip)
+    kept, tolerance = tracks.simplify(points, zoom)
+    return {
+        "trip_id": trip_id,
+        "zoom": zoom,
+        "tolerance_m": round(tolerance, 2),
+        "total_points": len(points),
+        "points": tracks.to_dicts(kept)
+    }
+
 @router.delete("/trips/{trip_id}")
 def delete_trip(trip_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
     check_admin(current_user)
@@ -253,110 +535,110 @@ def delete_trip(trip_id: int, current_user: models.User = Depends(get_current_us
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
+    rollup_keys = trip_rollup_keys(db, trip)
+
     # Manually delete logs first to be safe (cascade might not be set in DB)
     db.query(models.TripLog).filter(models.TripLog.trip_id == trip_id).delete()
+    db.query(models.TripBreadcrumb).filter(models.TripBreadcrumb.trip_id == trip_id).delete()
+    tracks.invalidate(db, trip_id)
     
+    event = live_feed.trip_deleted_event(trip)
     db.delete(trip)
+    refresh_keys(db, rollup_keys)
     db.commit()
+    trip_stats_cache.clear()
+    live_feed.publish(event)
     return {"message": "Trip deleted successfully"}
 
+def export_filename(db: Session, driver_id: Optional[int], extension: str = "xlsx") -> str:
+    filename = f"trips_export.{extension}"
+    if driver_id:
+         driver = db.query(models.User).options(joinedload(models.User.car)).filter(models.User.id == driver_id).first()
+         if driver:
+             clean_user = driver.username.replace(" ", "_")
+             # Use related car plate
+             clean_plate = (driver.car.plate if driver.car else "NoPlate").replace(" ", "")
+             filename = f"{clean_user}_{clean_plate}.{extension}"
+    return filename
+
 @router.get("/export")
 def export_trips(
     driver_id: Optional[int] = None, 
     start_date: Optional[str] = None, 
     end_date: Optional[str] = None, 
+    format: ExportFormat = ExportFormat.XLSX,
+    gzip: bool = False,
     current_user: models.User = Depends(get_current_user), 
     db: Session = Depends(database.get_db)
 ):
+    """
+    Export trips as xlsx (default), csv or parquet, all with the same "Trips" columns.
+    CSV is streamed straight from the database and can be gzip-compressed with ?gzip=true.
+    """
     check_admin(current_user)
     
-    # Query trips with logs
-    from sqlalchemy.orm import joinedload
-    query = db.query(models.Trip).options(joinedload(models.Trip.logs), joinedload(models.Trip.driver).joinedload(models.User.car))
-    
-    if driver_id:
-        query = query.filter(models.Trip.driver_id == driver_id)
-    
-    from datetime import datetime
-    if start_date:
-        try:
-            # Assuming start_date comes as YYYY-MM-DD
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            query = query.filter(models.Trip.start_date >= start_dt)
-        except ValueError:
-            pass # Ignore invalid date format
-            
-    if end_date:
-        try:
-            # Assuming end_date comes as YYYY-MM-DD
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-            # Set time to end of day
-            end_dt = end_dt.replace(hour=23, minute=59, second=59)
-            query = query.filter(models.Trip.start_date <= end_dt)
-        except ValueError:
-            pass # Ignore invalid date format
-    
-    trips = query.all()
-
-    data = []
-    for trip in trips:
-        logs = sorted(trip.logs, key=lambda x: x.timestamp)
-        
-        def get_log_parts(state):
-            relevant = [l for l in logs if l.state == state]
-            if not relevant: return "", ""
-            # Join multiple entries if they exist (e.g. multiple warehouses)
-            times = " | ".join([l.timestamp.strftime('%Y-%m-%d %H:%M') for l in relevant])
-            locs = " | ".join([l.address or 'N/A' for l in relevant])
-            return times, locs
-
-        ef_time, ef_loc = get_log_parts(models.TripState.EXIT_FACTORY)
-        aw_time, aw_loc = get_log_parts(models.TripState.ARRIVE_WAREHOUSE)
-        ew_time, ew_loc = get_log_parts(models.TripState.EXIT_WAREHOUSE)
-        af_time, af_loc = get_log_parts(models.TripState.ARRIVE_FACTORY)
-
-        row = {
-            "Trip ID": trip.id,
-            "Driver": trip.driver.username if trip.driver else "Unknown",
-            "Car Plate": (trip.car.plate if trip.car else (trip.driver.car.plate if trip.driver and trip.driver.car else "N/A")),
-            "Start Date": trip.start_date.strftime("%Y-%m-%d %H:%M") if trip.start_date else "",
-            "Status": trip.status.value,
-            "Exit Factory Time": ef_time,
-            "Exit Factory Location": ef_loc,
-            "Arrive Warehouse Time": aw_time,
-            "Arrive Warehouse Location": aw_loc,
-            "Exit Warehouse Time": ew_time,
-            "Exit Warehouse Location": ew_loc,
-            "Arrive Factory Time": af_time,
-            "Arrive Factory Location": af_loc,
-        }
-        data.append(row)
-
-    df = pd.DataFrame(data)
-    
-    filename = "trips_export.xlsx"
-    if driver_id and trips:
-         driver = trips[0].driver
-         if driver:
-             clean_user = driver.username.replace(" ", "_")
-             # Use related car plate
-             clean_plate = (driver.car.plate if driver.car else "NoPlate").replace(" ", "")
-             filename = f"{clean_user}_{clean_plate}.xlsx"
-
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Trips')
-        worksheet = writer.sheets['Trips']
-        for i, col in enumerate(df.columns):
-            max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.set_column(i, i, max_len)
-            
-    output.seek(0)
+    def build_query(export_db: Session):
+        return apply_trip_filters(export_db.query(models.Trip), driver_id, start_date, end_date)
+
+    extension = format.value
+    if format == ExportFormat.CSV:
+        body = stream_csv(build_query, compress=gzip)
+        media_type = GZIP_MEDIA_TYPE if gzip else CSV_MEDIA_TYPE
+        if gzip:
+            extension = "csv.gz"
+    elif format == ExportFormat.PARQUET:
+        body = iter_file(build_parquet(build_query(db)))
+        media_type = PARQUET_MEDIA_TYPE
+    else:
+        body = iter_file(build_xlsx(build_query(db)))
+        media_type = XLSX_MEDIA_TYPE
     
     headers = {
-        'Content-Disposition': f'attachment; filename="{filename}"'
+        'Content-Disposition': f'attachment; filename="{export_filename(db, driver_id, extension)}"'
     }
-    return Response(content=output.getvalue(), media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers=headers)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@router.post("/export/jobs", response_model=schemas.ExportJob)
+def create_export_job(
+    driver_id: Optional[int] = None, 
+    start_date: Optional[str] = None, 
+    end_date: Optional[str] = None, 
+    current_user: models.User = Depends(get_current_user), 
+    db: Session = Depends(database.get_db)
+):
+    """Queue a background export; an unchanged, already-built export is reused."""
+    check_admin(current_user)
+
+    # Cheap aggregate that changes whenever a matching trip is added, edited or deleted
+    fingerprint = tuple(apply_trip_filters(
+        db.query(func.count(models.Trip.id), func.max(models.Trip.id), func.max(models.Trip.updated_at)),
+        driver_id, start_date, end_date
+    ).one())
+    key = (driver_id, *parse_date_range(start_date, end_date))
+
+    def build_query(job_db: Session):
+        return apply_trip_filters(job_db.query(models.Trip), driver_id, start_date, end_date)
+
+    job = submit_export_job(key, fingerprint, export_filename(db, driver_id), build_query)
+    return job.to_dict()
+
+@router.get("/export/jobs/{job_id}", response_model=schemas.ExportJob)
+def get_export_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+@router.get("/export/jobs/{job_id}/download")
+def download_export_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    check_admin(current_user)
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != ExportJobStatus.DONE or not os.path.exists(job.path):
+        raise HTTPException(status_code=409, detail=f"Export is not ready (status: {job.status})")
+    return FileResponse(job.path, media_type=XLSX_MEDIA_TYPE, filename=job.filename)
 
 @router.get("/settings")
 def get_settings(db: Session = Depends(database.get_db)):
@@ -378,15 +660,30 @@ def update_settings(settings: dict, current_user: models.User = Depends(get_curr
 
 @router.post("/upload-logo")
 def upload_logo(file: UploadFile = File(...), current_user: models.User = Depends(get_current_user)):
+    """
+    Store the company logo under a name derived from its content, so the URL
+    can be cached forever and a new upload gets a new URL. Older versions are
+    kept because pages that are still open may reference them.
+    """
     check_admin(current_user)
-    import shutil
-    import os
-    
-    file_location = f"app/static/logo.png"
-    with open(file_location, "wb+") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    return {"url": "/static/logo.png"}
+    import gzip
+    import hashlib
+    from ..services.fuel_images import image_extension
+
+    data = file.file.read()
+    extension = ".svg" if file.content_type == "image/svg+xml" else image_extension(data[:16])
+    file_name = f"logo-{hashlib.sha256(data).hexdigest()[:16]}{extension}"
+    file_location = os.path.join("app/static", file_name)
+    if not os.path.exists(file_location):
+        with open(file_location + ".part", "wb") as buffer:
+            buffer.write(data)
+        os.replace(file_location + ".part", file_location)
+        if extension == ".svg":
+            # Served instead of the original to clients accepting gzip
+            with gzip.open(file_location + ".gz", "wb") as buffer:
+                buffer.write(data)
+
+    return {"url": f"/static/{file_name}"}
 
 # --- Backup Endpoints ---
 
@@ -460,44 +757,39 @@ def save_backup_settings(
 
 @router.get("/car-fuel-reports", response_model=List[schemas.CarFuelReport])
 def get_car_fuel_reports(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
     current_user: models.User = Depends(get_current_user), 
     db: Session = Depends(database.get_db)
 ):
+    """
+    Per-car distance and refill totals, optionally limited to a YYYY-MM-DD date range.
+    Totals come from the car_daily_stats rollup.
+    """
     check_admin(current_user)
     
-    # Get all cars
+    # Two queries regardless of fleet size or history length
     cars = db.query(models.Car).all()
-    
+    start_dt, end_dt = parse_date_range(start_date, end_date)
+
+    # Refill and distance totals per car from the daily rollup
+    totals_query = db.query(
+        models.CarDailyStat.car_id,
+        func.sum(models.CarDailyStat.refill_liters),
+        func.sum(models.CarDailyStat.distance_km),
+        func.sum(models.CarDailyStat.refill_count)
+    )
+    if start_dt:
+        totals_query = totals_query.filter(models.CarDailyStat.day >= start_dt.date())
+    if end_dt:
+        totals_query = totals_query.filter(models.CarDailyStat.day < end_dt.date())
+    totals = {row[0]: row[1:] for row in totals_query.group_by(models.CarDailyStat.car_id)}
+
     reports = []
     for car in cars:
-        total_distance = 0.0
-        total_refills = 0.0
-        all_fuel_logs = []
-        
-        # Get all trips for this car with logs and fuel logs
-        # Filter distance to completed trips as requested in implementation plan
-        trips = db.query(models.Trip).filter(models.Trip.car_id == car.id).all()
-        
-        for trip in trips:
-            # Only count distance for completed trips
-            if trip.status == models.TripStatus.COMPLETED:
-                dist = calculate_trip_distance(trip.logs)
-                total_distance += dist
-            
-            for f in trip.fuel_logs:
-                if f.amount_liters:
-                    total_refills += f.amount_liters
-                
-                all_fuel_logs.append({
-                    "id": f.id,
-                    "timestamp": f.timestamp,
-                    "amount": f.amount_liters,
-                    "indicator_img": f.indicator_image_url,
-                    "machine_img": f.machine_image_url,
-                    "address": f.address,
-                    "driver_name": f.driver.username if f.driver else "Unknown",
-                    "trip_id": trip.id
-                })
+        refills, distance, refill_count = totals.get(car.id, (0.0, 0.0, 0))
+        total_distance = distance or 0.0
+        total_refills = refills or 0.0
         
         estimated_consumption = estimate_fuel_consumption(total_distance, car.plate)
         
@@ -516,8 +808,43 @@ def get_car_fuel_reports(
             "total_actual_refills": round(total_refills, 2),
             "avg_consumption_l100km": round(avg_consumption, 2),
             "discrepancy": round(total_refills - estimated_consumption, 2),
-            "fuel_logs": sorted(all_fuel_logs, key=lambda x: str(x['timestamp']), reverse=True)
+            "refill_count": refill_count or 0
         })
         
     return reports
 
+@router.get("/cars/{car_id}/fuel-logs", response_model=schemas.CarFuelLogPage)
+def get_car_fuel_logs(
+    car_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """One page of a car's refills, newest first, with driver names joined in the same query."""
+    check_admin(current_user)
+    query = db.query(
+        models.FuelLog.id,
+        models.FuelLog.trip_id,
+        models.FuelLog.timestamp,
+        models.FuelLog.amount_liters.label("amount"),
+        models.FuelLog.indicator_image_url.label("indicator_img"),
+        models.FuelLog.machine_image_url.label("machine_img"),
+        models.FuelLog.address,
+        func.coalesce(models.User.username, "Unknown").label("driver_name")
+    ).join(models.Trip, models.FuelLog.trip_id == models.Trip.id) \
+     .outerjoin(models.User, models.FuelLog.driver_id == models.User.id) \
+     .filter(models.Trip.car_id == car_id)
+
+    start_dt, end_dt = parse_date_range(start_date, end_date)
+    if start_dt:
+        query = query.filter(models.FuelLog.timestamp >= start_dt)
+    if end_dt:
+        query = query.filter(models.FuelLog.timestamp < end_dt)
+
+    try:
+        return timestamp_keyset_paginate(query, models.FuelLog.timestamp, models.FuelLog.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -3,9 +3,12 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import make_transient_to_detached
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .. import database, models, schemas
+from ..cache import TTLCache
+from ..services import hashing
 import os
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -13,15 +16,28 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey") # Pulled from .env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 43200  # 30 days
+# Scoped tokens for URLs, where they end up in access logs and browser history
+LIVE_FEED_TICKET_SCOPE = "live_feed"
+LIVE_FEED_TICKET_EXPIRE_SECONDS = 60
+
+# Resolved users keyed by token subject (username). Invalidated explicitly when an
+# admin edits or deletes a user; the short TTL bounds staleness across workers.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_COLUMNS = ("id", "username", "hashed_password", "role", "car_id")
+user_cache = TTLCache(maxsize=1024, ttl=USER_CACHE_TTL_SECONDS)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# bcrypt always runs on the dedicated hashing pool, never on the event loop
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.run_sync(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hashing.run_async(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hashing.run_sync(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -34,6 +50,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    return resolve_user(token, db)
+
+def resolve_user(token: str, db: Session, scope: Optional[str] = None):
+    """
+    Resolve a token to its user. Bearer tokens carry no scope; a scoped token
+    (e.g. a live feed ticket) is only accepted where that scope is asked for.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -42,20 +65,41 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
+
+    snapshot = user_cache.get(token_data.username)
+    if snapshot is not None:
+        # Attach a copy to this request's session without querying; relationships
+        # such as user.car still lazy-load and changes still flush normally
+        cached_user = models.User(**snapshot)
+        make_transient_to_detached(cached_user)
+        return db.merge(cached_user, load=False)
+
     user = db.query(models.User).filter(models.User.username == token_data.username).first()
     if user is None:
         raise credentials_exception
+    user_cache.set(token_data.username, {column: getattr(user, column) for column in USER_CACHE_COLUMNS})
     return user
 
+def create_live_feed_ticket(user: models.User) -> str:
+    """Short-lived token that only opens the admin live feed, for the EventSource URL."""
+    return create_access_token(
+        data={"sub": user.username, "scope": LIVE_FEED_TICKET_SCOPE},
+        expires_delta=timedelta(seconds=LIVE_FEED_TICKET_EXPIRE_SECONDS)
+    )
+
+def invalidate_cached_user(username: str):
+    """Drop a user from the resolution cache after changing or deleting it."""
+    user_cache.invalidate(username)
+
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
     user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from ..services.image_variants import VARIANTS, ensure_variant
+from ..static_files import cached_file_response
+
+# Registered ahead of the /static mount so missing variants can be rendered on demand
+router = APIRouter(tags=["media"])
+
+@router.get("/static/fuel/variants/{variant}/{stem:path}.jpg")
+async def get_fuel_image_variant(variant: str, stem: str, request: Request):
+    """Serve a photo variant, rendering it on first request for photos uploaded before variants existed."""
+    if variant not in VARIANTS or ".." in stem.split("/") or stem.startswith("/"):
+        raise HTTPException(status_code=404, detail="Not Found")
+    path = await run_in_threadpool(ensure_variant, variant, stem)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return cached_file_response(path, request.headers)
@@ -1,20 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Header, Query
+from sqlalchemy import extract
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
-from datetime import datetime
-import os
-import uuid
-from sqlalchemy import func
+from datetime import datetime, timedelta
 from .. import database, models, schemas
-from ..timezone import now_saudi
+from ..timezone import now_saudi, ensure_saudi_naive
+from ..utils import haversine
+from ..pagination import timestamp_keyset_paginate
+from ..services import breadcrumbs, fuel_images, geocoding, idempotency, image_variants, live_feed, tracks
+from ..services.rollup import refresh_car_day
 from .auth import get_current_user
 
 router = APIRouter(prefix="/trips", tags=["trips"])
 
+# Which state may follow the trip's last logged state (None = no logs yet).
+# Drivers may loop through several warehouses before returning to the factory.
+TRIP_STATE_TRANSITIONS = {
+    None: {models.TripState.EXIT_FACTORY},
+    models.TripState.EXIT_FACTORY: {models.TripState.ARRIVE_WAREHOUSE},
+    models.TripState.ARRIVE_WAREHOUSE: {models.TripState.EXIT_WAREHOUSE},
+    models.TripState.EXIT_WAREHOUSE: {models.TripState.ARRIVE_WAREHOUSE, models.TripState.ARRIVE_FACTORY},
+    models.TripState.ARRIVE_FACTORY: set(),
+}
+
+# How far ahead of the server clock a phone's timestamps may be
+MAX_CLIENT_CLOCK_SKEW = timedelta(minutes=5)
+
+def last_trip_log(db: Session, trip_id: int):
+    return db.query(models.TripLog).filter(
+        models.TripLog.trip_id == trip_id
+    ).order_by(models.TripLog.timestamp.desc(), models.TripLog.id.desc()).first()
+
+def apply_flattened_log(trip: models.Trip, state: models.TripState, timestamp: datetime, address: Optional[str]):
+    """Copy a log onto the trip's flattened per-state columns; ARRIVE_FACTORY completes the trip."""
+    if state == models.TripState.EXIT_FACTORY:
+        trip.exit_factory_time = timestamp
+        trip.exit_factory_address = address
+    elif state == models.TripState.ARRIVE_WAREHOUSE:
+        trip.arrive_warehouse_time = timestamp
+        trip.arrive_warehouse_address = address
+    elif state == models.TripState.EXIT_WAREHOUSE:
+        trip.exit_warehouse_time = timestamp
+        trip.exit_warehouse_address = address
+    elif state == models.TripState.ARRIVE_FACTORY:
+        trip.arrive_factory_time = timestamp
+        trip.arrive_factory_address = address
+        trip.status = models.TripStatus.COMPLETED
+
 @router.post("/", response_model=schemas.Trip)
-def start_trip(current_user: models.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+def start_trip(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=64)
+):
     if current_user.role != models.UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can start trips")
+
+    replayed = idempotency.replay(db, current_user.id, idempotency_key, "start_trip")
+    if replayed:
+        return replayed
     
     # Check if there is an active trip
     active_trip = db.query(models.Trip).filter(
@@ -31,7 +75,12 @@ def start_trip(current_user: models.User = Depends(get_current_user), db: Sessio
         start_date=now_saudi()
     )
     db.add(new_trip)
-    db.commit()
+    db.flush()
+    event = live_feed.trip_event("trip_started", new_trip, timestamp=new_trip.start_date.isoformat())
+    replayed = idempotency.commit(db, current_user.id, idempotency_key, "start_trip", schemas.Trip.from_orm(new_trip))
+    if replayed:
+        return replayed
+    live_feed.publish(event)
     db.refresh(new_trip)
     return new_trip
 
@@ -50,8 +99,13 @@ def add_trip_log(
     trip_id: int, 
     log: schemas.TripLogCreate, 
     current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(database.get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=64)
 ):
+    replayed = idempotency.replay(db, current_user.id, idempotency_key, "add_trip_log")
+    if replayed:
+        return replayed
+
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -64,28 +118,136 @@ def add_trip_log(
 
     saudi_now = now_saudi()
     
+    # Extend the stored distance by the segment from the previous log only
+    previous = last_trip_log(db, trip.id)
+    if previous:
+        trip.distance_km = (trip.distance_km or 0.0) + haversine(
+            previous.latitude, previous.longitude, log.latitude, log.longitude
+        )
+    
     new_log = models.TripLog(trip_id=trip.id, timestamp=saudi_now, **log.dict())
     db.add(new_log)
     
     # Update flattened columns
-    if log.state == models.TripState.EXIT_FACTORY:
-        trip.exit_factory_time = saudi_now
-        trip.exit_factory_address = log.address
-    elif log.state == models.TripState.ARRIVE_WAREHOUSE:
-        trip.arrive_warehouse_time = saudi_now
-        trip.arrive_warehouse_address = log.address
-    elif log.state == models.TripState.EXIT_WAREHOUSE:
-        trip.exit_warehouse_time = saudi_now
-        trip.exit_warehouse_address = log.address
-    elif log.state == models.TripState.ARRIVE_FACTORY:
-        trip.arrive_factory_time = saudi_now
-        trip.arrive_factory_address = log.address
-        trip.status = models.TripStatus.COMPLETED
+    apply_flattened_log(trip, log.state, saudi_now, log.address)
+    if log.state == models.TripState.ARRIVE_FACTORY:
+        refresh_car_day(db, trip.car_id, trip.start_date)
     
-    db.commit()
+    db.flush()
+    event = live_feed.trip_event("trip_log", trip, new_log)
+    replayed = idempotency.commit(db, current_user.id, idempotency_key, "add_trip_log", schemas.TripLog.from_orm(new_log))
+    if replayed:
+        return replayed
+    live_feed.publish(event)
+    if log.state == models.TripState.ARRIVE_FACTORY:
+        tracks.schedule_precompute(trip_id)
     db.refresh(new_log)
+    geocoding.enqueue(new_log)
     return new_log
 
+@router.post("/{trip_id}/logs/batch", response_model=List[schemas.TripLog])
+def sync_trip_logs(
+    trip_id: int,
+    batch: schemas.TripLogBatch,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=64)
+):
+    """
+    Replay log events buffered on the phone while offline, in one transaction.
+    Events keep their client-captured timestamps and must follow the trip's
+    state machine, continuing from the last log already stored. Phone and
+    server clocks disagree, so a timestamp before the previous log (or trip
+    start) or after now is clamped to that bound; only state conflicts fail,
+    with a 409.
+    """
+    replayed = idempotency.replay(db, current_user.id, idempotency_key, "sync_trip_logs")
+    if replayed:
+        return replayed
+
+    trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    if trip.driver_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to log for this trip")
+    if trip.status == models.TripStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Trip is already completed")
+    if not batch.events:
+        return []
+
+    previous = last_trip_log(db, trip.id)
+    state = previous.state if previous else None
+    last_time = previous.timestamp if previous else trip.start_date
+    latest_allowed = now_saudi()
+
+    new_logs = []
+    distance = trip.distance_km or 0.0
+    for i, event in enumerate(batch.events):
+        if event.state not in TRIP_STATE_TRANSITIONS.get(state, set()):
+            raise HTTPException(status_code=409, detail=f"Event {i}: cannot log {event.state.value} after {state.value if state else 'trip start'}")
+        # The phone's order is authoritative; its clock is not
+        timestamp = max(min(ensure_saudi_naive(event.timestamp), latest_allowed), last_time)
+
+        if previous:
+            distance += haversine(previous.latitude, previous.longitude, event.latitude, event.longitude)
+        new_log = models.TripLog(trip_id=trip.id, **event.dict(exclude={"timestamp"}), timestamp=timestamp)
+        new_logs.append(new_log)
+        previous, state, last_time = new_log, event.state, timestamp
+
+    db.add_all(new_logs)
+
+    # Update the flattened columns once; the last event of each state wins
+    trip.distance_km = distance
+    for new_log in new_logs:
+        apply_flattened_log(trip, new_log.state, new_log.timestamp, new_log.address)
+    if state == models.TripState.ARRIVE_FACTORY:
+        refresh_car_day(db, trip.car_id, trip.start_date)
+
+    db.flush()
+    events = [live_feed.trip_event("trip_log", trip, new_log) for new_log in new_logs]
+    replayed = idempotency.commit(
+        db, current_user.id, idempotency_key, "sync_trip_logs",
+        [schemas.TripLog.from_orm(new_log) for new_log in new_logs]
+    )
+    if replayed:
+        return replayed
+    for event in events:
+        live_feed.publish(event)
+    if state == models.TripState.ARRIVE_FACTORY:
+        tracks.schedule_precompute(trip_id)
+    for new_log in new_logs:
+        db.refresh(new_log)
+        geocoding.enqueue(new_log)
+    return new_logs
+
+@router.post("/{trip_id}/breadcrumbs", response_model=schemas.BreadcrumbResult)
+def add_breadcrumbs(
+    trip_id: int,
+    batch: schemas.BreadcrumbBatch,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Record a batch of GPS positions for an in-progress trip.
+    Re-sent points are ignored, so a failed upload can simply be retried.
+    """
+    if len(batch.points) > breadcrumbs.MAX_BREADCRUMBS_PER_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {breadcrumbs.MAX_BREADCRUMBS_PER_BATCH} points per batch")
+
+    trip = db.query(models.Trip.driver_id, models.Trip.status).filter(models.Trip.id == trip_id).first()
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    if trip.driver_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to log for this trip")
+    if trip.status != models.TripStatus.IN_PROGRESS:
+        raise HTTPException(status_code=400, detail="Trip is already completed")
+
+    stored = breadcrumbs.store_breadcrumbs(db, trip_id, batch.points, now_saudi() + MAX_CLIENT_CLOCK_SKEW)
+    if stored:
+        timestamp, latitude, longitude, _ = stored[-1]
+        live_feed.publish(live_feed.position_event(trip_id, trip.driver_id, timestamp, latitude, longitude))
+    return {"received": len(batch.points), "stored": len(stored)}
+
 @router.patch("/{trip_id}/logs/{log_id}/address")
 def update_log_address(
     trip_id: int,
@@ -94,7 +256,7 @@ def update_log_address(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    """Update address of a trip log (used for async geocoding)"""
+    """Update address of a trip log (geocoded by older app versions; the server now fills it itself)"""
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -120,37 +282,63 @@ def update_log_address(
             trip.exit_warehouse_address = address
         elif log.state == models.TripState.ARRIVE_FACTORY:
             trip.arrive_factory_address = address
+        # Log edits change exported cells even when no trip column changes
+        trip.updated_at = now_saudi()
         db.commit()
 
     return {"status": "ok"}
 
-@router.get("/history", response_model=List[schemas.Trip])
+def month_range(year: int, month: Optional[int] = None):
+    """Half-open [start, end) datetime range covering a month, or the whole year without one."""
+    if month:
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    else:
+        start = datetime(year, 1, 1)
+        end = datetime(year + 1, 1, 1)
+    return start, end
+
+@router.get("/history", response_model=schemas.TripHistoryPage)
 def get_trip_history(
-    month: int = None,
-    year: int = None,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    year: Optional[int] = Query(None, ge=2000, le=2100),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    """Get driver's completed trip history, optionally filtered by month/year"""
+    """
+    Get driver's completed trip history, newest first, optionally filtered by month/year.
+    Pass the returned next_cursor back as `cursor` to fetch the following page.
+    """
     if current_user.role != models.UserRole.DRIVER:
         raise HTTPException(status_code=403, detail="Only drivers can access trip history")
-    
-    query = db.query(models.Trip).filter(
+
+    # Filters stay plain comparisons on start_date so ix_trips_driver_status_start serves them
+    query = db.query(models.Trip).options(
+        joinedload(models.Trip.driver),
+        joinedload(models.Trip.car),
+        selectinload(models.Trip.logs),
+        selectinload(models.Trip.fuel_logs)
+    ).filter(
         models.Trip.driver_id == current_user.id,
         models.Trip.status == models.TripStatus.COMPLETED
     )
-    
-    # Filter by month/year if provided
+
     if year:
-        query = query.filter(func.year(models.Trip.start_date) == year)
-    if month:
-        query = query.filter(func.month(models.Trip.start_date) == month)
-    
-    trips = query.order_by(models.Trip.start_date.desc()).all()
-    return trips
+        start, end = month_range(year, month)
+        query = query.filter(models.Trip.start_date >= start, models.Trip.start_date < end)
+    elif month:
+        # A month on its own means that month of every year, which no range can express
+        query = query.filter(extract("month", models.Trip.start_date) == month)
+
+    try:
+        return timestamp_keyset_paginate(query, models.Trip.start_date, models.Trip.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.post("/{trip_id}/fuel", response_model=schemas.FuelLog)
-async def log_fuel_refill(
+def log_fuel_refill(
     trip_id: int,
     amount_liters: float = Form(...),
     latitude: Optional[float] = Form(None),
@@ -159,27 +347,21 @@ async def log_fuel_refill(
     indicator_img: UploadFile = File(...),
     machine_img: UploadFile = File(...),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(database.get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=64)
 ):
+    # Answer retries before any image is written
+    replayed = idempotency.replay(db, current_user.id, idempotency_key, "log_fuel_refill")
+    if replayed:
+        return replayed
+
     trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     if trip.driver_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Save images
-    # We use app/static/fuel internally, but served as /static/fuel
-    base_dir = "app/static/fuel"
-    if not os.path.exists(base_dir):
-        os.makedirs(base_dir, exist_ok=True)
-
-    indicator_fn = f"{trip_id}_ind_{uuid.uuid4().hex[:8]}.png"
-    machine_fn = f"{trip_id}_mac_{uuid.uuid4().hex[:8]}.png"
-
-    with open(f"{base_dir}/{indicator_fn}", "wb") as f:
-        f.write(await indicator_img.read())
-    with open(f"{base_dir}/{machine_fn}", "wb") as f:
-        f.write(await machine_img.read())
+    urls = fuel_images.save_uploads({"indicator": indicator_img, "machine": machine_img})
 
     new_fuel_log = models.FuelLog(
         trip_id=trip_id,
@@ -188,11 +370,24 @@ async def log_fuel_refill(
         latitude=latitude,
         longitude=longitude,
         address=address,
-        indicator_image_url=f"/static/fuel/{indicator_fn}",
-        machine_image_url=f"/static/fuel/{machine_fn}",
+        indicator_image_url=urls["indicator"],
+        machine_image_url=urls["machine"],
         timestamp=now_saudi()
     )
     db.add(new_fuel_log)
-    db.commit()
+    refresh_car_day(db, trip.car_id, new_fuel_log.timestamp)
+    db.flush()
+    event = live_feed.trip_event(
+        "fuel_refill", trip, new_fuel_log,
+        fuel_log_id=new_fuel_log.id, amount_liters=new_fuel_log.amount_liters,
+        indicator_image_url=new_fuel_log.indicator_image_url,
+        machine_image_url=new_fuel_log.machine_image_url
+    )
+    replayed = idempotency.commit(db, current_user.id, idempotency_key, "log_fuel_refill", schemas.FuelLog.from_orm(new_fuel_log))
+    if replayed:
+        return replayed
+    live_feed.publish(event)
+    image_variants.schedule_variants(urls.values())
     db.refresh(new_fuel_log)
+    geocoding.enqueue(new_fuel_log)
     return new_fuel_log
@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, root_validator
 from typing import Optional, List
 from datetime import datetime
 from .models import UserRole, TripStatus, TripState, CarStatus
+from .services.image_variants import variant_url
 
 class CarBase(BaseModel):
     plate: str
@@ -58,6 +59,47 @@ class TripLogBase(BaseModel):
 class TripLogCreate(TripLogBase):
     pass
 
+class TripLogSyncEvent(TripLogBase):
+    timestamp: datetime # Captured on the phone when the event happened
+
+class TripLogBatch(BaseModel):
+    events: List[TripLogSyncEvent]
+
+class BreadcrumbPoint(BaseModel):
+    timestamp: datetime
+    latitude: float
+    longitude: float
+    speed_kmh: Optional[float] = None
+
+class BreadcrumbBatch(BaseModel):
+    points: List[BreadcrumbPoint]
+
+class LivePosition(BaseModel):
+    trip_id: int
+    driver_id: int
+    car_id: Optional[int] = None
+    state: Optional[TripState] = None
+    timestamp: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+class TrackPoint(BaseModel):
+    timestamp: datetime
+    latitude: float
+    longitude: float
+
+class TripTrack(BaseModel):
+    trip_id: int
+    zoom: int
+    tolerance_m: float
+    total_points: int
+    points: List[TrackPoint]
+
+class BreadcrumbResult(BaseModel):
+    received: int
+    stored: int
+
 class TripLog(TripLogBase):
     id: int
     trip_id: int
@@ -82,6 +124,18 @@ class FuelLog(FuelLogBase):
     timestamp: datetime
     indicator_image_url: Optional[str] = None
     machine_image_url: Optional[str] = None
+    indicator_thumb_url: Optional[str] = None
+    indicator_medium_url: Optional[str] = None
+    machine_thumb_url: Optional[str] = None
+    machine_medium_url: Optional[str] = None
+
+    @root_validator(skip_on_failure=True)
+    def add_variant_urls(cls, values):
+        for photo in ("indicator", "machine"):
+            original = values.get(f"{photo}_image_url")
+            values[f"{photo}_thumb_url"] = variant_url(original, "thumb")
+            values[f"{photo}_medium_url"] = variant_url(original, "medium")
+        return values
 
     class Config:
         orm_mode = True
@@ -106,6 +160,7 @@ class Trip(TripBase):
     exit_warehouse_address: Optional[str] = None
     arrive_factory_time: Optional[datetime] = None
     arrive_factory_address: Optional[str] = None
+    distance_km: Optional[float] = None
     logs: List[TripLog] = []
     fuel_logs: List[FuelLog] = []
     driver: Optional[User] = None
@@ -119,6 +174,57 @@ class Trip(TripBase):
     class Config:
         orm_mode = True
 
+class TripPage(BaseModel):
+    items: List[Trip] = []
+    next_cursor: Optional[int] = None # Pass back as ?cursor= for the next page
+
+class TripHistoryPage(BaseModel):
+    items: List[Trip] = []
+    next_cursor: Optional[str] = None # "<start_date>_<id>", pass back as ?cursor=
+
+class TripSummary(BaseModel):
+    """Flat trip row for list views; built from a column query, no nested logs."""
+    id: int
+    driver_id: int
+    car_id: Optional[int] = None
+    driver_name: Optional[str] = None
+    car_plate: Optional[str] = None
+    start_date: datetime
+    status: TripStatus
+    exit_factory_time: Optional[datetime] = None
+    exit_factory_address: Optional[str] = None
+    arrive_warehouse_time: Optional[datetime] = None
+    arrive_warehouse_address: Optional[str] = None
+    exit_warehouse_time: Optional[datetime] = None
+    exit_warehouse_address: Optional[str] = None
+    arrive_factory_time: Optional[datetime] = None
+    arrive_factory_address: Optional[str] = None
+    distance_km: Optional[float] = None
+    waiting_reason: Optional[str] = None
+    estimated_trip_time: Optional[str] = None
+    destination_city: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class TripSummaryPage(BaseModel):
+    items: List[TripSummary] = []
+    next_cursor: Optional[int] = None
+
+class MonthlyTripCount(BaseModel):
+    year: int
+    month: int
+    count: int
+
+class TripStats(BaseModel):
+    """Dashboard counters over all trips; day boundaries are Saudi time."""
+    total: int = 0
+    active: int = 0
+    completed: int = 0
+    today: int = 0
+    this_month: int = 0
+    monthly: List[MonthlyTripCount] = [] # Newest month first
+
 class TripLogUpdate(BaseModel):
     id: Optional[int] = None
     timestamp: Optional[datetime] = None
@@ -146,7 +252,46 @@ class CarFuelReport(BaseModel):
     total_actual_refills: float
     avg_consumption_l100km: float
     discrepancy: float
-    fuel_logs: List[dict] = []
+    refill_count: int = 0
+
+class CarFuelLogEntry(BaseModel):
+    id: int
+    trip_id: int
+    timestamp: datetime
+    amount: Optional[float] = None
+    indicator_img: Optional[str] = None
+    machine_img: Optional[str] = None
+    indicator_thumb: Optional[str] = None
+    indicator_medium: Optional[str] = None
+    machine_thumb: Optional[str] = None
+    machine_medium: Optional[str] = None
+    address: Optional[str] = None
+    driver_name: Optional[str] = None
+
+    @root_validator(skip_on_failure=True)
+    def add_variant_urls(cls, values):
+        for photo in ("indicator", "machine"):
+            original = values.get(f"{photo}_img")
+            values[f"{photo}_thumb"] = variant_url(original, "thumb")
+            values[f"{photo}_medium"] = variant_url(original, "medium")
+        return values
+
+    class Config:
+        orm_mode = True
+
+class CarFuelLogPage(BaseModel):
+    items: List[CarFuelLogEntry] = []
+    next_cursor: Optional[str] = None # Pass back as ?cursor= for older refills
+
+class ExportJob(BaseModel):
+    id: str
+    status: str
+    rows_processed: int = 0
+    total_rows: Optional[int] = None
+    error: Optional[str] = None
+    filename: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
 
 class Token(BaseModel):
     access_token: str
@@ -155,5 +300,9 @@ class Token(BaseModel):
     username: str
     user_id: int
 
+class LiveFeedTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
 class TokenData(BaseModel):
     username: Optional[str] = None
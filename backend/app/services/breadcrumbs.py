@@ -0,0 +1,98 @@
+"""
+GPS breadcrumb ingestion.
+
+Phones post positions in batches while a trip is in progress. Points closer
+than BREADCRUMB_MIN_DISTANCE_M to the last stored point are dropped unless
+BREADCRUMB_STATIONARY_INTERVAL has passed, so a parked truck keeps one point a
+minute instead of one every few seconds. Survivors are written with a single
+executemany INSERT per batch, which MySQL drivers send as multi-row inserts.
+Points already stored for the same trip and timestamp (a retried batch, e.g.
+on another worker or after a restart) are skipped by the database's unique
+(trip_id, timestamp) key, not by the per-process cache.
+"""
+import math
+import os
+from datetime import timedelta
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from .. import models
+from ..cache import TTLCache
+from ..timezone import ensure_saudi_naive
+
+MAX_BREADCRUMBS_PER_BATCH = int(os.getenv("MAX_BREADCRUMBS_PER_BATCH", "1000"))
+BREADCRUMB_MIN_DISTANCE_M = float(os.getenv("BREADCRUMB_MIN_DISTANCE_M", "15"))
+BREADCRUMB_STATIONARY_INTERVAL = timedelta(seconds=int(os.getenv("BREADCRUMB_STATIONARY_SECONDS", "60")))
+
+EARTH_RADIUS_M = 6371000.0
+
+# Last stored (timestamp, latitude, longitude) per trip, so a batch needs no
+# query to continue downsampling from the previous one; only a hint, since
+# another worker may have stored newer points
+last_points = TTLCache(maxsize=5000, ttl=3600)
+
+def approx_distance_m(lat1, lon1, lat2, lon2) -> float:
+    """Equirectangular approximation; accurate to well under a metre at breadcrumb spacing."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+def last_stored_point(db: Session, trip_id: int):
+    point = last_points.get(trip_id)
+    if point is None:
+        row = db.query(
+            models.TripBreadcrumb.timestamp, models.TripBreadcrumb.latitude, models.TripBreadcrumb.longitude
+        ).filter(
+            models.TripBreadcrumb.trip_id == trip_id
+        ).order_by(models.TripBreadcrumb.timestamp.desc()).first()
+        point = tuple(row) if row else None
+    return point
+
+def downsample(points, last=None) -> list:
+    """
+    Keep points that moved far enough or waited long enough since the last kept one.
+    `points` are (timestamp, latitude, longitude, speed) tuples sorted by time;
+    anything not newer than `last` (e.g. a re-sent batch) is dropped.
+    """
+    kept = []
+    for point in points:
+        timestamp, latitude, longitude = point[:3]
+        if last is not None:
+            if timestamp <= last[0]:
+                continue
+            moved = approx_distance_m(last[1], last[2], latitude, longitude)
+            if moved < BREADCRUMB_MIN_DISTANCE_M and timestamp - last[0] < BREADCRUMB_STATIONARY_INTERVAL:
+                continue
+        kept.append(point)
+        last = point
+    return kept
+
+def insert_ignoring_duplicates(db: Session):
+    """INSERT into trip_breadcrumbs that skips rows whose (trip_id, timestamp) is already stored."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(models.TripBreadcrumb).on_conflict_do_nothing(index_elements=["trip_id", "timestamp"])
+    stmt = mysql_insert(models.TripBreadcrumb)
+    # A no-op update rather than INSERT IGNORE, which would also swallow other errors
+    return stmt.on_duplicate_key_update(trip_id=stmt.inserted.trip_id)
+
+def store_breadcrumbs(db: Session, trip_id: int, points, latest_allowed) -> list:
+    """
+    Downsample and bulk-insert a batch of schemas.BreadcrumbPoint; returns the
+    kept (timestamp, lat, lon, speed) rows, including any that were already stored.
+    """
+    rows = sorted(
+        [(ensure_saudi_naive(p.timestamp), p.latitude, p.longitude, p.speed_kmh) for p in points],
+        key=lambda row: row[0]
+    )
+    rows = [row for row in rows if row[0] <= latest_allowed]
+    kept = downsample(rows, last_stored_point(db, trip_id))
+    if not kept:
+        return kept
+
+    db.execute(insert_ignoring_duplicates(db), [
+        {"trip_id": trip_id, "timestamp": ts, "latitude": lat, "longitude": lon, "speed_kmh": speed}
+        for ts, lat, lon, speed in kept
+    ])
+    db.commit()
+    last_points.set(trip_id, kept[-1][:3])
+    return kept
@@ -0,0 +1,246 @@
+"""
+Trip export builders.
+
+Trips are read in chunks and written row by row, so peak memory stays bounded
+by the chunk size rather than by the number of exported trips.
+"""
+import csv
+import enum
+import io
+import tempfile
+import zlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from .. import models
+from ..database import SessionLocal
+
+# Rows per database round trip while exporting
+EXPORT_CHUNK_SIZE = 1000
+
+# Rows per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 10000
+
+# Files up to this size stay in memory, larger ones spill to a temp file on disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+GZIP_MEDIA_TYPE = "application/gzip"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+class ExportFormat(str, enum.Enum):
+    XLSX = "xlsx"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+EXPORT_COLUMNS = [
+    "Trip ID",
+    "Driver",
+    "Car Plate",
+    "Start Date",
+    "Status",
+    "Exit Factory Time",
+    "Exit Factory Location",
+    "Arrive Warehouse Time",
+    "Arrive Warehouse Location",
+    "Exit Warehouse Time",
+    "Exit Warehouse Location",
+    "Arrive Factory Time",
+    "Arrive Factory Location",
+]
+
+# Per-state log columns: (state, time column, location column)
+LOG_STATE_COLUMNS = [
+    (models.TripState.EXIT_FACTORY, "Exit Factory Time", "Exit Factory Location"),
+    (models.TripState.ARRIVE_WAREHOUSE, "Arrive Warehouse Time", "Arrive Warehouse Location"),
+    (models.TripState.EXIT_WAREHOUSE, "Exit Warehouse Time", "Exit Warehouse Location"),
+    (models.TripState.ARRIVE_FACTORY, "Arrive Factory Time", "Arrive Factory Location"),
+]
+
+def pivot_logs(db, trip_ids) -> pd.DataFrame:
+    """
+    Fetch the logs of `trip_ids` in one query and pivot them into per-state
+    time/location cells indexed by trip id. Multiple logs of the same state
+    (e.g. several warehouses) are joined with " | " in timestamp order.
+    """
+    logs = pd.DataFrame(
+        db.query(
+            models.TripLog.trip_id, models.TripLog.state,
+            models.TripLog.timestamp, models.TripLog.address
+        ).filter(models.TripLog.trip_id.in_(trip_ids)).all(),
+        columns=["trip_id", "state", "timestamp", "address"]
+    )
+    cells = pd.DataFrame(index=pd.Index(trip_ids, name="trip_id"))
+    if logs.empty:
+        for _, time_col, loc_col in LOG_STATE_COLUMNS:
+            cells[time_col] = ""
+            cells[loc_col] = ""
+        return cells
+
+    logs = logs.sort_values(["trip_id", "timestamp"], kind="stable")
+    logs["state"] = logs["state"].map(lambda state: models.TripState(state).value)
+    # Format the whole column at once rather than cell by cell
+    logs["time"] = pd.to_datetime(logs["timestamp"]).dt.strftime('%Y-%m-%d %H:%M').fillna("")
+    logs["address"] = logs["address"].fillna("N/A")
+
+    grouped = logs.groupby(["trip_id", "state"], sort=False).agg({"time": " | ".join, "address": " | ".join})
+    times = grouped["time"].unstack("state")
+    locs = grouped["address"].unstack("state")
+
+    for state, time_col, loc_col in LOG_STATE_COLUMNS:
+        cells[time_col] = times[state.value] if state.value in times.columns else ""
+        cells[loc_col] = locs[state.value] if state.value in locs.columns else ""
+    return cells.fillna("")
+
+def build_export_frame(db, trips: list) -> pd.DataFrame:
+    """Build the "Trips" sheet rows for one chunk of (id, driver, plate, start_date, status) tuples."""
+    frame = pd.DataFrame(trips, columns=EXPORT_COLUMNS[:5])
+    frame["Driver"] = frame["Driver"].fillna("Unknown")
+    frame["Car Plate"] = frame["Car Plate"].fillna("N/A")
+    frame["Start Date"] = pd.to_datetime(frame["Start Date"]).dt.strftime("%Y-%m-%d %H:%M").fillna("")
+    frame["Status"] = frame["Status"].map(lambda status: models.TripStatus(status).value)
+
+    cells = pivot_logs(db, frame["Trip ID"].tolist())
+    return frame.join(cells, on="Trip ID")[EXPORT_COLUMNS]
+
+def iter_export_rows(query, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yield export rows for every trip matched by `query`.
+    Trips are read as plain columns `chunk_size` at a time, each chunk its own
+    `id > last ORDER BY id LIMIT n` query: mysql-connector buffers whole result
+    sets, so a single streamed query would still load every trip up front.
+    Each chunk costs one extra query for its logs, pivoted with pandas.
+    """
+    DriverCar = aliased(models.Car)
+    query = query.with_entities(
+        models.Trip.id,
+        models.User.username,
+        # Trip's own car first, falling back to the driver's current car
+        func.coalesce(models.Car.plate, DriverCar.plate),
+        models.Trip.start_date,
+        models.Trip.status,
+    ).outerjoin(models.User, models.Trip.driver_id == models.User.id) \
+     .outerjoin(models.Car, models.Trip.car_id == models.Car.id) \
+     .outerjoin(DriverCar, models.User.car_id == DriverCar.id) \
+     .order_by(None).order_by(models.Trip.id)
+
+    db = query.session
+    last_id = 0
+    while True:
+        chunk = query.filter(models.Trip.id > last_id).limit(chunk_size).all()
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        frame = build_export_frame(db, chunk)
+        for row in frame.astype(object).itertuples(index=False, name=None):
+            yield list(row)
+        if len(chunk) < chunk_size:
+            break
+
+def iter_chunks(rows, size: int):
+    """Group an iterable of rows into lists of at most `size` rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_xlsx(rows, fileobj):
+    """
+    Write rows to a single "Trips" sheet using xlsxwriter's constant_memory mode,
+    which flushes each row to disk as soon as the next one starts.
+    """
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Trips')
+    header_format = workbook.add_format({'bold': True, 'border': 1})
+
+    worksheet.write_row(0, 0, EXPORT_COLUMNS, header_format)
+    widths = [len(col) for col in EXPORT_COLUMNS]
+
+    for row_num, row in enumerate(rows, start=1):
+        worksheet.write_row(row_num, 0, row)
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(str(value)))
+
+    # Column widths are only emitted on close, so they can be set after the data
+    for i, width in enumerate(widths):
+        worksheet.set_column(i, i, width + 2)
+
+    workbook.close()
+
+def build_xlsx(query):
+    """Build the export workbook into a spooled temp file, rewound and ready to stream."""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        write_xlsx(iter_export_rows(query), output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+def stream_csv(build_query, compress: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Stream the export as CSV (optionally gzip-compressed), one chunk of rows at a time.
+    Opens its own session because the response body outlives the request's session.
+    """
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    db = SessionLocal()
+    try:
+        writer.writerow(EXPORT_COLUMNS)
+        yield flush()
+        for chunk in iter_chunks(iter_export_rows(build_query(db), chunk_size), chunk_size):
+            writer.writerows(chunk)
+            yield flush()
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
+
+def build_parquet(query):
+    """Write the export to a spooled Parquet file, one row group per PARQUET_ROW_GROUP_SIZE rows."""
+    schema = pa.schema(
+        [pa.field(EXPORT_COLUMNS[0], pa.int64())] +
+        [pa.field(col, pa.string()) for col in EXPORT_COLUMNS[1:]]
+    )
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        with pq.ParquetWriter(pa.PythonFile(output, mode="w"), schema) as writer:
+            for chunk in iter_chunks(iter_export_rows(query), PARQUET_ROW_GROUP_SIZE):
+                columns = [list(col) for col in zip(*chunk)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+def iter_file(fileobj, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Stream a file object in fixed-size chunks and close it afterwards."""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
@@ -0,0 +1,133 @@
+"""
+Background trip export jobs.
+
+Exports run on a small, bounded worker pool instead of inside the HTTP request.
+Each finished artifact is kept on disk and handed out again when the same
+filters are requested and none of the matching trips changed in the meantime.
+"""
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from ..database import SessionLocal
+from ..timezone import now_saudi
+from .export import iter_export_rows, write_xlsx
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "trip_exports"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+MAX_EXPORT_JOBS = 20
+
+class ExportJobStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class ExportJob:
+    def __init__(self, key, fingerprint, filename):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fingerprint = fingerprint
+        self.filename = filename
+        self.path = os.path.join(EXPORT_DIR, f"{self.id}.xlsx")
+        self.status = ExportJobStatus.PENDING
+        self.rows_processed = 0
+        self.total_rows = None
+        self.error = None
+        self.created_at = now_saudi()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "rows_processed": self.rows_processed,
+            "total_rows": self.total_rows,
+            "error": self.error,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+jobs = {}
+jobs_lock = threading.Lock()
+
+def get_job(job_id: str):
+    with jobs_lock:
+        return jobs.get(job_id)
+
+def find_reusable_job(key, fingerprint):
+    """Return a queued, running or finished job for identical filters over unchanged data."""
+    with jobs_lock:
+        for job in jobs.values():
+            if job.key != key or job.fingerprint != fingerprint:
+                continue
+            if job.status == ExportJobStatus.FAILED:
+                continue
+            if job.status == ExportJobStatus.DONE and not os.path.exists(job.path):
+                continue
+            return job
+    return None
+
+def submit_export_job(key, fingerprint, filename, build_query) -> ExportJob:
+    """
+    Queue an export, or reuse an equivalent job.
+    `build_query(db)` must return the filtered Trip query for a fresh session.
+    """
+    existing = find_reusable_job(key, fingerprint)
+    if existing:
+        return existing
+
+    job = ExportJob(key, fingerprint, filename)
+    with jobs_lock:
+        jobs[job.id] = job
+    cleanup_old_jobs()
+    executor.submit(run_export_job, job, build_query)
+    return job
+
+def run_export_job(job: ExportJob, build_query):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    db = SessionLocal()
+    try:
+        job.status = ExportJobStatus.RUNNING
+        query = build_query(db)
+        job.total_rows = query.count()
+
+        def counted(rows):
+            for row in rows:
+                yield row
+                job.rows_processed += 1
+
+        # Write to a temp name so a half-written file is never served
+        tmp_path = f"{job.path}.part"
+        write_xlsx(counted(iter_export_rows(query)), tmp_path)
+        os.replace(tmp_path, job.path)
+
+        job.status = ExportJobStatus.DONE
+    except Exception as e:
+        logger.error(f"Export job {job.id} failed: {e}")
+        job.error = str(e)
+        job.status = ExportJobStatus.FAILED
+    finally:
+        job.finished_at = now_saudi()
+        db.close()
+
+def cleanup_old_jobs():
+    """Keep only the MAX_EXPORT_JOBS most recent jobs and delete older artifacts."""
+    with jobs_lock:
+        finished = [j for j in jobs.values() if j.status in (ExportJobStatus.DONE, ExportJobStatus.FAILED)]
+        if len(jobs) <= MAX_EXPORT_JOBS:
+            return
+        finished.sort(key=lambda j: j.created_at)
+        for job in finished[:len(jobs) - MAX_EXPORT_JOBS]:
+            del jobs[job.id]
+            try:
+                if os.path.exists(job.path):
+                    os.remove(job.path)
+            except Exception as e:
+                logger.warning(f"Failed to delete old export {job.path}: {e}")
@@ -0,0 +1,154 @@
+"""
+Fuel refill photo storage.
+
+Uploads are copied from Starlette's spooled temp file to their destination in
+fixed-size chunks, so memory per upload stays constant. The refill endpoint is
+a sync handler, so it runs on FastAPI's threadpool rather than the event
+loop, and the photos of one refill are copied concurrently on a small
+dedicated pool; request bodies over FUEL_UPLOAD_MAX_BODY_BYTES are refused by
+BodySizeLimitMiddleware before Starlette spools them.
+
+Files are content-addressed: a photo is stored as ab/cd/<sha256>.<ext> below
+FUEL_IMAGE_DIR, so no directory grows beyond a few thousand entries and an
+identical upload (e.g. a retried request) reuses the existing file.
+"""
+import hashlib
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from fastapi import HTTPException, UploadFile
+
+# We use app/static/fuel internally, but served as /static/fuel
+FUEL_IMAGE_DIR = "app/static/fuel"
+FUEL_IMAGE_URL_PREFIX = "/static/fuel"
+FUEL_IMAGE_MAX_BYTES = int(os.getenv("FUEL_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Whole multipart body of a refill: both photos plus the form fields
+FUEL_UPLOAD_MAX_BODY_BYTES = 2 * FUEL_IMAGE_MAX_BYTES + 64 * 1024
+# Uploads in progress live here until their hash is known
+FUEL_IMAGE_TMP_DIR = os.path.join(FUEL_IMAGE_DIR, "tmp")
+FUEL_UPLOAD_WORKERS = int(os.getenv("FUEL_UPLOAD_WORKERS", "4"))
+
+executor = ThreadPoolExecutor(max_workers=FUEL_UPLOAD_WORKERS, thread_name_prefix="fuel-upload")
+
+# Leading bytes of the formats phones produce; anything else keeps the legacy .png
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+]
+
+class ImageTooLarge(Exception):
+    pass
+
+def too_large_error() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Image exceeds the {FUEL_IMAGE_MAX_BYTES // (1024 * 1024)} MB upload limit"
+    )
+
+def image_extension(head: bytes) -> str:
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return ".png"
+
+def content_path(digest: str, extension: str) -> str:
+    """Relative path of a stored photo, sharded by the first two byte pairs of its hash."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+def url_for(relative_path: str) -> str:
+    return f"{FUEL_IMAGE_URL_PREFIX}/{relative_path}"
+
+def path_for_url(url: str) -> str:
+    """Filesystem path of a /static/fuel URL."""
+    return os.path.join(FUEL_IMAGE_DIR, *url[len(FUEL_IMAGE_URL_PREFIX):].strip("/").split("/"))
+
+def store_file(tmp_path: str, digest: str, extension: str):
+    """Move a hashed temp file to its content address; returns (relative path, created)."""
+    relative_path = content_path(digest, extension)
+    final_path = os.path.join(FUEL_IMAGE_DIR, relative_path)
+    if os.path.exists(final_path):
+        # Same bytes are already stored
+        os.remove(tmp_path)
+        return relative_path, False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return relative_path, True
+
+def copy_limited(source, max_bytes: int = FUEL_IMAGE_MAX_BYTES):
+    """
+    Copy `source` into storage chunk by chunk, hashing as it goes and giving up
+    once it exceeds `max_bytes`. Returns (relative path, created).
+    """
+    os.makedirs(FUEL_IMAGE_TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(FUEL_IMAGE_TMP_DIR, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    head = b""
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ImageTooLarge()
+                if len(head) < 16:
+                    head += chunk[:16]
+                digest.update(chunk)
+                f.write(chunk)
+        return store_file(tmp_path, digest.hexdigest(), image_extension(head))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_upload(upload: UploadFile):
+    """Store one upload; returns (public URL, whether a new file was created)."""
+    relative_path, created = copy_limited(upload.file)
+    return url_for(relative_path), created
+
+def remove_image(url: str):
+    path = path_for_url(url)
+    if os.path.exists(path):
+        os.remove(path)
+
+def save_uploads(uploads: dict) -> dict:
+    """
+    Store several uploads concurrently and return their URLs, keyed like
+    `uploads` ({name: UploadFile}). Sizes reported by the client are checked
+    before anything is written; if any upload fails, files this call created
+    are removed again (files shared with earlier uploads are kept).
+    Blocking: call it from a sync endpoint, which FastAPI runs in its threadpool.
+    """
+    for upload in uploads.values():
+        if upload.size is not None and upload.size > FUEL_IMAGE_MAX_BYTES:
+            raise too_large_error()
+
+    futures = {name: executor.submit(save_upload, upload) for name, upload in uploads.items()}
+    # Let every copy finish, so a failure can't leave a sibling's file behind
+    wait(futures.values())
+
+    urls = {}
+    created_urls = []
+    error = None
+    for name, future in futures.items():
+        try:
+            url, created = future.result()
+        except Exception as e:
+            error = error or e
+            continue
+        urls[name] = url
+        if created:
+            created_urls.append(url)
+    if error is not None:
+        for url in created_urls:
+            remove_image(url)
+        if isinstance(error, ImageTooLarge):
+            raise too_large_error()
+        raise error
+    return urls
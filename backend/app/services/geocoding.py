@@ -0,0 +1,288 @@
+"""
+Server-side reverse geocoding.
+
+Trip and fuel logs are stored with the coordinates as a placeholder address and
+queued here. A background thread drains the queue in batches, resolves each
+distinct coordinate cell once (memory cache, then the geocode_cells table, then
+the provider) and writes the addresses back in one transaction per batch.
+Logs whose address changed in the meantime are left alone. Logs whose cell the
+provider failed on, or whose batch failed to commit, are queued again after an
+exponential backoff, up to GEOCODE_MAX_ATTEMPTS times.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import Optional
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .. import models
+from ..cache import TTLCache
+from ..database import SessionLocal
+from ..timezone import now_saudi
+
+logger = logging.getLogger(__name__)
+
+# Cells are 10^-4 degrees (about 11 m) by default
+GEOCODE_CELL_DECIMALS = int(os.getenv("GEOCODE_CELL_DECIMALS", "4"))
+GEOCODE_PROVIDER = os.getenv("GEOCODE_PROVIDER", "nominatim")
+GEOCODE_BATCH_SIZE = 100
+# How long the worker waits for more items before processing a partial batch
+GEOCODE_BATCH_WAIT_SECONDS = 2.0
+# Most recent logs re-queued on startup, since the queue itself is not persisted
+GEOCODE_SWEEP_LIMIT = 1000
+GEOCODE_MAX_ATTEMPTS = 5
+# Delay before the first retry; doubled for each further attempt
+GEOCODE_RETRY_BASE_SECONDS = 30.0
+
+ADDRESS_MAX_LENGTH = 255
+
+# "24.71234, 46.67531" as sent by the driver app before the address is known
+PLACEHOLDER_PATTERN = re.compile(r"^\s*-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?\s*$")
+
+def needs_address(address: Optional[str]) -> bool:
+    return not address or bool(PLACEHOLDER_PATTERN.match(address))
+
+def to_cell(latitude: float, longitude: float):
+    scale = 10 ** GEOCODE_CELL_DECIMALS
+    return round(latitude * scale), round(longitude * scale)
+
+def cell_center(cell):
+    scale = 10 ** GEOCODE_CELL_DECIMALS
+    return cell[0] / scale, cell[1] / scale
+
+class NominatimProvider:
+    """OpenStreetMap Nominatim, limited to one request per second as its usage policy requires."""
+
+    url = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+    min_interval = 1.0
+    timeout = 10
+
+    def __init__(self):
+        self._last_request = 0.0
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        wait = self._last_request + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+
+        params = urllib.parse.urlencode({"format": "json", "lat": latitude, "lon": longitude})
+        request = urllib.request.Request(
+            f"{self.url}?{params}",
+            headers={"User-Agent": "driver-trip-tracker/1.0"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.load(response)
+        return data.get("display_name")
+
+class LocalProvider:
+    """Offline stand-in that names a location after its coordinates."""
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        return f"Location {latitude:.{GEOCODE_CELL_DECIMALS}f}, {longitude:.{GEOCODE_CELL_DECIMALS}f}"
+
+PROVIDERS = {
+    "nominatim": NominatimProvider,
+    "local": LocalProvider,
+}
+
+provider = PROVIDERS[GEOCODE_PROVIDER]()
+
+def set_provider(new_provider):
+    """Swap the provider, e.g. for a LocalProvider in tests. It needs a reverse(lat, lon) method."""
+    global provider
+    provider = new_provider
+
+cell_cache = TTLCache(maxsize=10000, ttl=24 * 3600)
+provider_calls = 0
+provider_failures = 0
+retried_items = 0
+dropped_items = 0
+
+# Items are (model class, row id, latitude, longitude, placeholder address, attempt)
+pending = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+def enqueue(log):
+    """Queue a committed TripLog or FuelLog whose address is still a placeholder."""
+    if log.latitude is None or log.longitude is None or not needs_address(log.address):
+        return
+    pending.put((type(log), log.id, log.latitude, log.longitude, log.address, 0))
+
+def retry_later(items):
+    """Queue items again after a backoff that grows with their attempt count, or give up on them."""
+    global retried_items, dropped_items
+    by_attempt = {}
+    for item in items:
+        attempt = item[5] + 1
+        if attempt >= GEOCODE_MAX_ATTEMPTS:
+            dropped_items += 1
+            continue
+        by_attempt.setdefault(attempt, []).append(item[:5] + (attempt,))
+
+    for attempt, retries in by_attempt.items():
+        retried_items += len(retries)
+        timer = threading.Timer(
+            GEOCODE_RETRY_BASE_SECONDS * 2 ** (attempt - 1),
+            lambda retries=retries: [pending.put(item) for item in retries]
+        )
+        timer.daemon = True
+        timer.start()
+
+def store_cell(db, cell, address: str):
+    """Insert or overwrite one geocode_cells row; a single statement, so another worker storing the same cell can't conflict."""
+    values = {"lat_cell": cell[0], "lon_cell": cell[1], "address": address, "created_at": now_saudi()}
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite_insert(models.GeocodeCell).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["lat_cell", "lon_cell"],
+            set_={"address": stmt.excluded.address}
+        )
+    else:
+        stmt = mysql_insert(models.GeocodeCell).values(**values)
+        stmt = stmt.on_duplicate_key_update({"address": stmt.inserted.address})
+    db.execute(stmt)
+
+def resolve_cells(db, cells):
+    """
+    Map each cell to an address, calling the provider only for cells never seen
+    before. Returns (addresses, cells the provider failed on).
+    """
+    global provider_calls, provider_failures
+    addresses = {}
+    failed = set()
+    missing = []
+    for cell in cells:
+        address = cell_cache.get(cell)
+        if address is None:
+            missing.append(cell)
+        else:
+            addresses[cell] = address
+
+    if missing:
+        stored = db.query(models.GeocodeCell).filter(
+            tuple_(models.GeocodeCell.lat_cell, models.GeocodeCell.lon_cell).in_(missing)
+        ).all()
+        for row in stored:
+            cell = (row.lat_cell, row.lon_cell)
+            addresses[cell] = row.address
+            cell_cache.set(cell, row.address)
+
+    for cell in missing:
+        if cell in addresses:
+            continue
+        provider_calls += 1
+        try:
+            address = provider.reverse(*cell_center(cell))
+        except Exception as e:
+            provider_failures += 1
+            logger.warning(f"Reverse geocoding {cell_center(cell)} failed: {e}")
+            failed.add(cell)
+            continue
+        if not address:
+            continue
+        address = address[:ADDRESS_MAX_LENGTH]
+        store_cell(db, cell, address)
+        cell_cache.set(cell, address)
+        addresses[cell] = address
+    return addresses, failed
+
+def apply_addresses(db, items, addresses: dict):
+    """Write resolved addresses onto logs (and the trips' flattened columns) still holding their placeholder."""
+    by_model = {}
+    for model, row_id, latitude, longitude, placeholder, _ in items:
+        address = addresses.get(to_cell(latitude, longitude))
+        if address:
+            by_model.setdefault(model, {})[row_id] = (placeholder, address)
+
+    for model, updates in by_model.items():
+        rows = db.query(model).filter(model.id.in_(list(updates))).all()
+        trips = {}
+        if model is models.TripLog:
+            trip_ids = {row.trip_id for row in rows}
+            trips = {t.id: t for t in db.query(models.Trip).filter(models.Trip.id.in_(trip_ids))}
+        for row in rows:
+            placeholder, address = updates[row.id]
+            if row.address != placeholder:
+                continue
+            row.address = address
+            trip = trips.get(row.trip_id)
+            if trip is not None:
+                column = f"{models.TripState(row.state).value.lower()}_address"
+                if getattr(trip, column) == placeholder:
+                    setattr(trip, column, address)
+                # Exports show every log's address, so mark the trip changed even if no column did
+                trip.updated_at = now_saudi()
+
+def process_batch(items):
+    db = SessionLocal()
+    try:
+        cells = {to_cell(item[2], item[3]) for item in items}
+        addresses, failed = resolve_cells(db, cells)
+        apply_addresses(db, items, addresses)
+        db.commit()
+        retry_later([item for item in items if to_cell(item[2], item[3]) in failed])
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Geocoding batch of {len(items)} logs failed: {e}")
+        # Addresses resolved before the failure are cached, so a retry costs no provider calls
+        retry_later(items)
+    finally:
+        db.close()
+
+def next_batch():
+    """Block for the first item, then collect up to a full batch for a short while."""
+    items = [pending.get()]
+    deadline = time.monotonic() + GEOCODE_BATCH_WAIT_SECONDS
+    while len(items) < GEOCODE_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            items.append(pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return items
+
+def run_worker():
+    while True:
+        process_batch(next_batch())
+
+def enqueue_recent_placeholders():
+    """Re-queue the most recent logs still waiting for an address, e.g. after a restart."""
+    db = SessionLocal()
+    try:
+        for model in (models.TripLog, models.FuelLog):
+            rows = db.query(model).order_by(model.id.desc()).limit(GEOCODE_SWEEP_LIMIT).all()
+            for row in rows:
+                enqueue(row)
+    finally:
+        db.close()
+
+def start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            return
+        _worker = threading.Thread(target=run_worker, name="geocoding", daemon=True)
+        _worker.start()
+    enqueue_recent_placeholders()
+
+def stats() -> dict:
+    return {
+        "provider": type(provider).__name__,
+        "queued": pending.qsize(),
+        "provider_calls": provider_calls,
+        "provider_failures": provider_failures,
+        "retried_items": retried_items,
+        "dropped_items": dropped_items,
+        "cell_cache": cell_cache.stats(),
+    }
@@ -0,0 +1,49 @@
+"""
+Dedicated, size-bounded pool for bcrypt work.
+
+bcrypt is deliberately slow (~250 ms per call). Running it on the event loop,
+or letting a burst of logins occupy the shared request threadpool, stalls every
+other request. Here at most PASSWORD_HASH_WORKERS hashes run at once and the
+rest wait in the pool's queue, which is exposed through stats().
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+_lock = threading.Lock()
+_stats = {"queued": 0, "running": 0, "completed": 0, "peak_queue_depth": 0}
+
+def _tracked(fn, args):
+    with _lock:
+        _stats["queued"] -= 1
+        _stats["running"] += 1
+    try:
+        return fn(*args)
+    finally:
+        with _lock:
+            _stats["running"] -= 1
+            _stats["completed"] += 1
+
+def submit(fn, *args):
+    """Queue fn(*args) on the hashing pool and return its Future."""
+    with _lock:
+        _stats["queued"] += 1
+        _stats["peak_queue_depth"] = max(_stats["peak_queue_depth"], _stats["queued"])
+    return executor.submit(_tracked, fn, args)
+
+def run_sync(fn, *args):
+    """Run on the pool from synchronous code (e.g. a plain `def` endpoint) and wait."""
+    return submit(fn, *args).result()
+
+async def run_async(fn, *args):
+    """Run on the pool without blocking the event loop."""
+    return await asyncio.wrap_future(submit(fn, *args))
+
+def stats() -> dict:
+    with _lock:
+        return {"workers": PASSWORD_HASH_WORKERS, **_stats}
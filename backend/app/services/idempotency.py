@@ -0,0 +1,67 @@
+"""
+Idempotency-Key support for driver write endpoints.
+
+Phones on flaky networks retry requests whose response was lost. When a request
+carries an Idempotency-Key header, its response is stored in the same
+transaction as the write it describes, so a retry is answered from the store
+without repeating the write, and a write is never recorded without its response.
+"""
+import json
+from datetime import timedelta
+from typing import Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+from ..timezone import now_saudi
+
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+def replay(db: Session, user_id: int, key: Optional[str], endpoint: str) -> Optional[JSONResponse]:
+    """Return the stored response for a retried request, or None if the key is new."""
+    if not key:
+        return None
+    record = db.get(models.IdempotencyRecord, (user_id, key))
+    if not record or record.expires_at < now_saudi():
+        return None
+    if record.endpoint != endpoint:
+        raise HTTPException(status_code=409, detail="Idempotency-Key was already used for a different request")
+    return JSONResponse(content=json.loads(record.response))
+
+def commit(db: Session, user_id: int, key: Optional[str], endpoint: str, response) -> Optional[JSONResponse]:
+    """
+    Commit the pending write together with its response.
+    If a concurrent request with the same key won the race, roll back and
+    return that request's stored response instead; otherwise return None.
+    """
+    if key:
+        record = db.get(models.IdempotencyRecord, (user_id, key))
+        if record:
+            # Expired entry for a reused key: take it over
+            db.delete(record)
+            db.flush()
+        db.add(models.IdempotencyRecord(
+            user_id=user_id,
+            key=key,
+            endpoint=endpoint,
+            response=json.dumps(jsonable_encoder(response)),
+            expires_at=now_saudi() + IDEMPOTENCY_TTL
+        ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        stored = replay(db, user_id, key, endpoint)
+        if stored is None:
+            raise
+        return stored
+    return None
+
+def purge_expired(db: Session) -> int:
+    deleted = db.query(models.IdempotencyRecord).filter(
+        models.IdempotencyRecord.expires_at < now_saudi()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
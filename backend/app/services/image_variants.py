@@ -0,0 +1,91 @@
+"""
+Downscaled variants of fuel photos.
+
+Every stored photo gets a thumbnail and a mid-size JPEG under
+FUEL_IMAGE_DIR/variants/<variant>/, mirroring the original's path. They are
+generated on a background thread right after an upload, and on first request
+for photos stored before variants existed (see routers.media).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .fuel_images import FUEL_IMAGE_DIR, FUEL_IMAGE_URL_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> (longest edge in pixels, JPEG quality)
+VARIANTS = {
+    "thumb": (200, 70),
+    "medium": (960, 80),
+}
+VARIANT_DIR = os.path.join(FUEL_IMAGE_DIR, "variants")
+ORIGINAL_EXTENSIONS = (".jpg", ".png", ".webp", ".gif")
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-variants")
+
+def variant_url(url: Optional[str], variant: str) -> Optional[str]:
+    """URL of a photo's variant; None for missing or non-fuel URLs."""
+    if not url or not url.startswith(FUEL_IMAGE_URL_PREFIX + "/"):
+        return None
+    stem = os.path.splitext(url[len(FUEL_IMAGE_URL_PREFIX) + 1:])[0]
+    return f"{FUEL_IMAGE_URL_PREFIX}/variants/{variant}/{stem}.jpg"
+
+def variant_path(variant: str, stem: str) -> str:
+    return os.path.join(VARIANT_DIR, variant, *stem.split("/")) + ".jpg"
+
+def find_original(stem: str) -> Optional[str]:
+    """Locate the original photo for a variant stem; its extension is not part of the variant URL."""
+    base = os.path.join(FUEL_IMAGE_DIR, *stem.split("/"))
+    for extension in ORIGINAL_EXTENSIONS:
+        if os.path.isfile(base + extension):
+            return base + extension
+    return None
+
+def render_variant(original_path: str, variant: str, stem: str) -> str:
+    """Write one variant of `original_path` and return its path."""
+    from PIL import Image, ImageOps
+
+    max_edge, quality = VARIANTS[variant]
+    path = variant_path(variant, stem)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with Image.open(original_path) as image:
+        # Phones store rotation in EXIF; bake it in since the JPEG drops the tag
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image.thumbnail((max_edge, max_edge))
+        tmp_path = f"{path}.part"
+        image.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+    return path
+
+def ensure_variant(variant: str, stem: str) -> Optional[str]:
+    """
+    Path of a variant, rendering it first if needed; None if the original is gone.
+    Falls back to the original itself when it cannot be decoded as an image.
+    """
+    path = variant_path(variant, stem)
+    if os.path.exists(path):
+        return path
+    original = find_original(stem)
+    if original is None:
+        return None
+    try:
+        return render_variant(original, variant, stem)
+    except Exception as e:
+        logger.warning(f"Cannot render {variant} of {original}, serving the original: {e}")
+        return original
+
+def generate_variants(urls):
+    for url in urls:
+        if not url:
+            continue
+        stem = os.path.splitext(url[len(FUEL_IMAGE_URL_PREFIX) + 1:])[0]
+        for variant in VARIANTS:
+            try:
+                ensure_variant(variant, stem)
+            except OSError as e:
+                logger.error(f"Creating {variant} of {url} failed: {e}")
+
+def schedule_variants(urls):
+    """Render all variants of freshly uploaded photos in the background."""
+    executor.submit(generate_variants, list(urls))
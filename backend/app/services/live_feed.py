@@ -0,0 +1,184 @@
+"""
+Live fleet feed.
+
+Write endpoints publish small delta messages after they commit; admin
+dashboards receive them over Server-Sent Events instead of re-downloading the
+trip list. Messages go through a backend so that several uvicorn workers can
+share one feed: the local backend only reaches subscribers of the same
+process, the Redis backend relays every message to all workers.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+LIVE_FEED_BACKEND = os.getenv("LIVE_FEED_BACKEND", "local")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LIVE_FEED_CHANNEL = "live_feed"
+# Slow subscribers lose their oldest messages rather than growing without bound
+SUBSCRIBER_QUEUE_SIZE = 256
+
+class LocalBackend:
+    """Delivers straight to this process's subscribers."""
+
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, message: dict):
+        self.deliver(message)
+
+class RedisBackend:
+    """
+    Relays messages through Redis pub/sub so every worker's subscribers see them.
+    Needs the `redis` package, which is only required for this backend.
+    """
+
+    def __init__(self, url: str = REDIS_URL, channel: str = LIVE_FEED_CHANNEL):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+
+    def start(self, deliver):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+
+        def listen():
+            for item in pubsub.listen():
+                try:
+                    deliver(json.loads(item["data"]))
+                except Exception as e:
+                    logger.error(f"Dropping malformed live feed message: {e}")
+
+        threading.Thread(target=listen, name="live-feed", daemon=True).start()
+
+    def publish(self, message: dict):
+        self.client.publish(self.channel, json.dumps(message))
+
+BACKENDS = {
+    "local": LocalBackend,
+    "redis": RedisBackend,
+}
+
+class Broadcaster:
+    """Fans messages out to per-connection asyncio queues; publish() may be called from any thread."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.subscribers = set()
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+        backend.start(self.deliver)
+
+    def add_listener(self, listener):
+        """Call `listener(message)` synchronously for every delivered message, e.g. to keep in-memory state in step."""
+        self.listeners.append(listener)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self.lock:
+            self.subscribers = {s for s in self.subscribers if s[1] is not queue}
+
+    def publish(self, message: dict):
+        # A feed outage must never fail the write that triggered it
+        try:
+            self.backend.publish(message)
+            self.published += 1
+        except Exception as e:
+            logger.error(f"Publishing live feed message failed: {e}")
+
+    def deliver(self, message: dict):
+        for listener in self.listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"Live feed listener failed: {e}")
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, message)
+            except RuntimeError:
+                # The subscriber's event loop is already closed
+                self.unsubscribe(queue)
+
+    def _put(self, queue: asyncio.Queue, message: dict):
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(message)
+
+    def stats(self) -> dict:
+        with self.lock:
+            subscribers = len(self.subscribers)
+        return {
+            "backend": type(self.backend).__name__,
+            "subscribers": subscribers,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+broadcaster = Broadcaster(BACKENDS[LIVE_FEED_BACKEND]())
+
+def format_sse(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+
+def trip_event(event_type: str, trip: models.Trip, log=None, **extra) -> dict:
+    """Delta message for a trip, with the position of `log` (a TripLog or FuelLog) if given."""
+    message = {
+        "type": event_type,
+        "trip_id": trip.id,
+        "driver_id": trip.driver_id,
+        "car_id": trip.car_id,
+        "status": models.TripStatus(trip.status).value if trip.status else None,
+        "state": None,
+        "timestamp": None,
+        "latitude": None,
+        "longitude": None,
+        "address": None,
+    }
+    if log is not None:
+        state = getattr(log, "state", None)
+        message.update(
+            state=models.TripState(state).value if state else None,
+            timestamp=log.timestamp.isoformat() if log.timestamp else None,
+            latitude=log.latitude,
+            longitude=log.longitude,
+            address=log.address,
+        )
+    message.update(extra)
+    return message
+
+def position_event(trip_id: int, driver_id: int, timestamp, latitude: float, longitude: float) -> dict:
+    """Latest breadcrumb of a trip; carries no state change."""
+    return {
+        "type": "position",
+        "trip_id": trip_id,
+        "driver_id": driver_id,
+        "timestamp": timestamp.isoformat(),
+        "latitude": latitude,
+        "longitude": longitude,
+    }
+
+def trip_deleted_event(trip: models.Trip) -> dict:
+    """Build before deleting; status and start_date let dashboards adjust their counters."""
+    return {
+        "type": "trip_deleted",
+        "trip_id": trip.id,
+        "driver_id": trip.driver_id,
+        "status": models.TripStatus(trip.status).value if trip.status else None,
+        "timestamp": trip.start_date.isoformat() if trip.start_date else None,
+    }
+
+def publish(message: dict):
+    broadcaster.publish(message)
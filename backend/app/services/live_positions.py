@@ -0,0 +1,97 @@
+"""
+Latest known position of every in-progress trip.
+
+The registry is rebuilt from the database with one query at startup and then
+kept current from live feed messages, so every worker sees every write when
+the feed uses a shared backend. Serving it costs O(active trips) no matter how
+much history is stored.
+"""
+import threading
+from datetime import datetime
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from .. import models
+from ..timezone import now_saudi
+from .live_feed import broadcaster
+
+positions = {}
+positions_lock = threading.Lock()
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def rebuild(db: Session):
+    """Load every in-progress trip with its latest log in a single query."""
+    ranked = db.query(
+        models.TripLog.trip_id,
+        models.TripLog.state,
+        models.TripLog.timestamp,
+        models.TripLog.latitude,
+        models.TripLog.longitude,
+        func.row_number().over(
+            partition_by=models.TripLog.trip_id,
+            order_by=(models.TripLog.timestamp.desc(), models.TripLog.id.desc())
+        ).label("rank")
+    ).join(models.Trip, models.Trip.id == models.TripLog.trip_id) \
+     .filter(models.Trip.status == models.TripStatus.IN_PROGRESS).subquery()
+
+    rows = db.query(
+        models.Trip.id, models.Trip.driver_id, models.Trip.car_id, models.Trip.start_date,
+        ranked.c.state, ranked.c.timestamp, ranked.c.latitude, ranked.c.longitude
+    ).outerjoin(ranked, and_(ranked.c.trip_id == models.Trip.id, ranked.c.rank == 1)) \
+     .filter(models.Trip.status == models.TripStatus.IN_PROGRESS).all()
+
+    entries = {}
+    for trip_id, driver_id, car_id, start_date, state, timestamp, latitude, longitude in rows:
+        entries[trip_id] = {
+            "trip_id": trip_id,
+            "driver_id": driver_id,
+            "car_id": car_id,
+            "state": models.TripState(state).value if state else None,
+            "timestamp": timestamp or start_date,
+            "latitude": latitude,
+            "longitude": longitude,
+            "updated_at": now_saudi(),
+        }
+    with positions_lock:
+        positions.clear()
+        positions.update(entries)
+
+def apply_message(message: dict):
+    """Fold one live feed message into the registry."""
+    trip_id = message["trip_id"]
+    event_type = message["type"]
+    with positions_lock:
+        if event_type == "trip_deleted" or message.get("status") == models.TripStatus.COMPLETED.value:
+            positions.pop(trip_id, None)
+            return
+
+        entry = positions.get(trip_id)
+        if entry is None:
+            if event_type == "position" or event_type == "fuel_refill":
+                # Trip unknown to this worker's snapshot; wait for a state event
+                return
+            entry = positions[trip_id] = {
+                "trip_id": trip_id, "driver_id": message["driver_id"], "car_id": message.get("car_id"),
+                "state": None, "timestamp": None, "latitude": None, "longitude": None,
+            }
+        if "car_id" in message:
+            entry["car_id"] = message["car_id"]
+        if event_type in ("trip_log", "trip_updated"):
+            entry["state"] = message.get("state")
+
+        timestamp = parse_timestamp(message.get("timestamp"))
+        # Offline-synced logs and breadcrumbs can arrive out of order; keep the newest fix
+        is_newer = timestamp is not None and (entry["timestamp"] is None or timestamp >= entry["timestamp"])
+        if event_type == "trip_updated" or is_newer:
+            entry["timestamp"] = timestamp
+            if message.get("latitude") is not None:
+                entry["latitude"] = message["latitude"]
+                entry["longitude"] = message["longitude"]
+        entry["updated_at"] = now_saudi()
+
+def snapshot() -> list:
+    with positions_lock:
+        return sorted((dict(entry) for entry in positions.values()), key=lambda e: e["trip_id"])
+
+broadcaster.add_listener(apply_message)
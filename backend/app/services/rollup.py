@@ -0,0 +1,127 @@
+"""
+Daily per-car rollup (car_daily_stats) used by the fuel reports.
+
+Completed trips count towards the day of their start_date and refills towards
+the day of their timestamp. Whenever a trip or fuel log changes, only the
+affected (car, day) rows are recomputed, so reports over any date range read a
+handful of pre-aggregated rows instead of scanning trips.
+"""
+from datetime import datetime, time, timedelta
+from sqlalchemy import Date, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from .. import models
+
+def day_bounds(day):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+def refresh_car_day(db: Session, car_id, day):
+    """Recompute one car_daily_stats row from the trips and fuel logs of that car and day."""
+    if car_id is None or day is None:
+        return
+    if isinstance(day, datetime):
+        day = day.date()
+
+    # Sessions don't autoflush, so make pending trip/log changes visible to the aggregates
+    db.flush()
+    day_start, day_end = day_bounds(day)
+
+    distance, trip_count = db.query(
+        func.coalesce(func.sum(models.Trip.distance_km), 0.0), func.count(models.Trip.id)
+    ).filter(
+        models.Trip.car_id == car_id,
+        models.Trip.status == models.TripStatus.COMPLETED,
+        models.Trip.start_date >= day_start,
+        models.Trip.start_date < day_end
+    ).one()
+
+    refill_liters, refill_count = db.query(
+        func.coalesce(func.sum(models.FuelLog.amount_liters), 0.0), func.count(models.FuelLog.id)
+    ).join(models.Trip, models.FuelLog.trip_id == models.Trip.id).filter(
+        models.Trip.car_id == car_id,
+        models.FuelLog.timestamp >= day_start,
+        models.FuelLog.timestamp < day_end
+    ).one()
+
+    upsert_car_day(db, {
+        "car_id": car_id, "day": day,
+        "distance_km": distance, "trip_count": trip_count,
+        "refill_liters": refill_liters, "refill_count": refill_count
+    })
+
+ROLLUP_VALUE_COLUMNS = ("distance_km", "trip_count", "refill_liters", "refill_count")
+
+def upsert_car_day(db: Session, values: dict):
+    """
+    Insert or overwrite one car_daily_stats row in a single statement, so two
+    concurrent writes for the same car and day can't both attempt the insert.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite_insert(models.CarDailyStat).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["car_id", "day"],
+            set_={column: stmt.excluded[column] for column in ROLLUP_VALUE_COLUMNS}
+        )
+    else:
+        stmt = mysql_insert(models.CarDailyStat).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            {column: stmt.inserted[column] for column in ROLLUP_VALUE_COLUMNS}
+        )
+    db.execute(stmt)
+
+def trip_rollup_keys(db: Session, trip) -> set:
+    """Every (car_id, day) row a trip contributes to: its start day and its refill days."""
+    keys = {(trip.car_id, trip.start_date.date() if trip.start_date else None)}
+    for (timestamp,) in db.query(models.FuelLog.timestamp).filter(models.FuelLog.trip_id == trip.id):
+        keys.add((trip.car_id, timestamp.date() if timestamp else None))
+    return keys
+
+def driver_rollup_keys(db: Session, driver_id: int) -> set:
+    """Every (car_id, day) row the trips of one driver contribute to, in two queries."""
+    rows = db.query(models.Trip.car_id, models.Trip.start_date).filter(
+        models.Trip.driver_id == driver_id
+    ).all()
+    rows += db.query(models.Trip.car_id, models.FuelLog.timestamp).join(
+        models.Trip, models.FuelLog.trip_id == models.Trip.id
+    ).filter(models.Trip.driver_id == driver_id).all()
+    return {(car_id, timestamp.date() if timestamp else None) for car_id, timestamp in rows}
+
+def refresh_keys(db: Session, keys):
+    for car_id, day in keys:
+        refresh_car_day(db, car_id, day)
+
+def rebuild_car_daily_stats(db: Session) -> int:
+    """Rebuild the whole rollup with two GROUP BY queries. Returns the number of rows written."""
+    rows = {}
+
+    def row(car_id, day):
+        return rows.setdefault((car_id, day), {
+            "car_id": car_id, "day": day,
+            "distance_km": 0.0, "trip_count": 0, "refill_liters": 0.0, "refill_count": 0
+        })
+
+    trip_day = func.date(models.Trip.start_date, type_=Date)
+    for car_id, day, distance, trip_count in db.query(
+        models.Trip.car_id, trip_day, func.sum(models.Trip.distance_km), func.count(models.Trip.id)
+    ).filter(
+        models.Trip.status == models.TripStatus.COMPLETED, models.Trip.car_id.isnot(None)
+    ).group_by(models.Trip.car_id, trip_day):
+        stat = row(car_id, day)
+        stat["distance_km"] = distance or 0.0
+        stat["trip_count"] = trip_count
+
+    fuel_day = func.date(models.FuelLog.timestamp, type_=Date)
+    for car_id, day, liters, refill_count in db.query(
+        models.Trip.car_id, fuel_day, func.sum(models.FuelLog.amount_liters), func.count(models.FuelLog.id)
+    ).join(models.Trip, models.FuelLog.trip_id == models.Trip.id).filter(
+        models.Trip.car_id.isnot(None)
+    ).group_by(models.Trip.car_id, fuel_day):
+        stat = row(car_id, day)
+        stat["refill_liters"] = liters or 0.0
+        stat["refill_count"] = refill_count
+
+    db.query(models.CarDailyStat).delete()
+    db.bulk_insert_mappings(models.CarDailyStat, list(rows.values()))
+    return len(rows)
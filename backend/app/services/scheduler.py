@@ -1,7 +1,9 @@
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from .backup import create_backup
+from .idempotency import purge_expired
 from ..database import SessionLocal
 from ..models import SystemSetting
 
@@ -21,6 +23,18 @@ def run_automated_backup():
     except Exception as e:
         logger.error(f"Automated backup failed: {e}")
 
+def purge_idempotency_keys():
+    """Drop stored Idempotency-Key responses past their expiry."""
+    db = SessionLocal()
+    try:
+        deleted = purge_expired(db)
+        if deleted:
+            logger.info(f"Purged {deleted} expired idempotency keys")
+    except Exception as e:
+        logger.error(f"Purging idempotency keys failed: {e}")
+    finally:
+        db.close()
+
 def init_scheduler():
     """
     Starts the scheduler and registers the backup task based on the current database time setting.
@@ -32,6 +46,12 @@ def init_scheduler():
         
     scheduler.start()
     update_backup_schedule() # Load the schedule from the DB
+    scheduler.add_job(
+        purge_idempotency_keys,
+        IntervalTrigger(hours=1),
+        id="purge_idempotency_keys",
+        replace_existing=True
+    )
 
 def update_backup_schedule(hour=None, minute=None, is_enabled=None):
     """
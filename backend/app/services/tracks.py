@@ -0,0 +1,191 @@
+"""
+Simplified trip paths for map replay.
+
+A trip's path is its state logs merged with its GPS breadcrumbs. Douglas-Peucker
+is run once with every tolerance at the same time: each point gets the largest
+tolerance at which it would still be kept, so simplifying for any zoom level is
+a single comparison. Completed trips never change apart from admin edits, so
+their annotated path is stored in trip_tracks (and a short-lived memory cache)
+as soon as they finish.
+"""
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+from ..cache import TTLCache
+from ..database import SessionLocal
+from ..timezone import now_saudi
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+# Web Mercator ground resolution at zoom 0 on the equator
+METERS_PER_PIXEL_Z0 = 156543.03392
+# Points closer than this many screen pixels to the simplified line are dropped
+TRACK_PIXEL_TOLERANCE = float(os.getenv("TRACK_PIXEL_TOLERANCE", "1.0"))
+
+# "t" is nanoseconds since the epoch, whatever resolution pandas would infer
+TRACK_DTYPE = np.dtype([("t", "<i8"), ("lat", "<f8"), ("lon", "<f8"), ("sig", "<f4")])
+# Bump when TRACK_DTYPE or the meaning of its fields changes; 1 stored "t" in
+# pandas' inferred unit, which is microseconds on pandas 3
+TRACK_FORMAT_VERSION = 2
+
+# Other workers may serve a track for up to the TTL after an admin edit
+track_cache = TTLCache(maxsize=200, ttl=300)
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracks")
+
+def load_points(db: Session, trip_id: int) -> np.ndarray:
+    """Merge a trip's logs and breadcrumbs into time-ordered records."""
+    rows = db.query(
+        models.TripLog.timestamp, models.TripLog.latitude, models.TripLog.longitude
+    ).filter(models.TripLog.trip_id == trip_id).all()
+    rows += db.query(
+        models.TripBreadcrumb.timestamp, models.TripBreadcrumb.latitude, models.TripBreadcrumb.longitude
+    ).filter(models.TripBreadcrumb.trip_id == trip_id).all()
+    rows = [row for row in rows if row[0] is not None and row[1] is not None and row[2] is not None]
+
+    points = np.empty(len(rows), dtype=TRACK_DTYPE)
+    if rows:
+        timestamps, lats, lons = zip(*rows)
+        points["t"] = pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+        points["lat"] = lats
+        points["lon"] = lons
+        points.sort(order="t", kind="stable")
+        points["sig"] = significance(points["lat"], points["lon"])
+    return points
+
+def significance(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Douglas-Peucker tolerance (metres) up to which each point survives.
+    A point never outranks the point that split its parent segment, so the
+    points kept at any tolerance form exactly the Douglas-Peucker result.
+    """
+    n = len(lats)
+    sig = np.zeros(n, dtype=np.float32)
+    if n == 0:
+        return sig
+    sig[0] = sig[-1] = np.inf
+
+    # Local equirectangular projection in metres is plenty for a single trip
+    scale = math.cos(math.radians(float(np.mean(lats))))
+    x = np.radians(lons) * scale * EARTH_RADIUS_M
+    y = np.radians(lats) * EARTH_RADIUS_M
+
+    # Split every open segment of the current level at once, breadth first
+    first = np.array([0])
+    last = np.array([n - 1])
+    parent = np.array([np.inf])
+    while True:
+        open_ = last - first >= 2
+        first, last, parent = first[open_], last[open_], parent[open_]
+        if len(first) == 0:
+            break
+
+        # Interior point indices of all segments, concatenated, with their owning segment
+        counts = last - first - 1
+        owner = np.repeat(np.arange(len(first)), counts)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        inner = np.arange(counts.sum()) - offsets[owner] + first[owner] + 1
+
+        ax, ay = x[first][owner], y[first][owner]
+        dx, dy = x[last][owner] - ax, y[last][owner] - ay
+        px, py = x[inner], y[inner]
+        length_sq = dx * dx + dy * dy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(length_sq > 0, ((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+        # First point at each segment's maximum distance
+        peak = np.maximum.reduceat(dist, offsets)
+        candidates = np.flatnonzero(dist == peak[owner])
+        _, first_hit = np.unique(owner[candidates], return_index=True)
+        split = inner[candidates[first_hit]]
+
+        value = np.minimum(peak, parent)
+        sig[split] = value
+
+        # Segments whose points all lie on the line (e.g. a parked truck) keep 0 everywhere
+        moving = peak > 0
+        first, last, split, value = first[moving], last[moving], split[moving], value[moving]
+        first, last, parent = (
+            np.concatenate((first, split)),
+            np.concatenate((split, last)),
+            np.concatenate((value, value)),
+        )
+    return sig
+
+def tolerance_for_zoom(zoom: int, latitude: float) -> float:
+    """Ground distance (metres) covered by TRACK_PIXEL_TOLERANCE pixels at `zoom`."""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom) * TRACK_PIXEL_TOLERANCE
+
+def simplify(points: np.ndarray, zoom: int):
+    """Return (kept points, tolerance in metres) for a map at `zoom`."""
+    if len(points) == 0:
+        return points, 0.0
+    tolerance = tolerance_for_zoom(zoom, float(np.mean(points["lat"])))
+    return points[points["sig"] >= tolerance], tolerance
+
+def to_dicts(points: np.ndarray) -> list:
+    timestamps = pd.to_datetime(points["t"], unit="ns").to_pydatetime()
+    return [
+        {"timestamp": ts, "latitude": lat, "longitude": lon}
+        for ts, lat, lon in zip(timestamps, points["lat"].tolist(), points["lon"].tolist())
+    ]
+
+def store_track(db: Session, trip_id: int, points: np.ndarray):
+    track = db.get(models.TripTrack, trip_id) or models.TripTrack(trip_id=trip_id)
+    track.point_count = len(points)
+    track.data = points.tobytes()
+    track.format_version = TRACK_FORMAT_VERSION
+    track.computed_at = now_saudi()
+    db.merge(track)
+
+def get_track(db: Session, trip: models.Trip) -> np.ndarray:
+    """Annotated path of a trip; completed trips are served from the cache or trip_tracks."""
+    if trip.status != models.TripStatus.COMPLETED:
+        return load_points(db, trip.id)
+
+    points = track_cache.get(trip.id)
+    if points is not None:
+        return points
+
+    track = db.get(models.TripTrack, trip.id)
+    if track is not None and track.format_version == TRACK_FORMAT_VERSION:
+        points = np.frombuffer(track.data, dtype=TRACK_DTYPE)
+    else:
+        points = load_points(db, trip.id)
+        # Missing, or written in an older format
+        store_track(db, trip.id, points)
+        try:
+            db.commit()
+        except IntegrityError:
+            # The background precompute stored it first
+            db.rollback()
+    track_cache.set(trip.id, points)
+    return points
+
+def invalidate(db: Session, trip_id: int):
+    """Drop a trip's stored track, e.g. after its logs were edited; commit with the edit."""
+    db.query(models.TripTrack).filter(models.TripTrack.trip_id == trip_id).delete(synchronize_session=False)
+    track_cache.invalidate(trip_id)
+
+def precompute(trip_id: int):
+    db = SessionLocal()
+    try:
+        store_track(db, trip_id, load_points(db, trip_id))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Precomputing track of trip {trip_id} failed: {e}")
+    finally:
+        db.close()
+
+def schedule_precompute(trip_id: int):
+    """Compute and store a just-completed trip's track in the background."""
+    executor.submit(precompute, trip_id)
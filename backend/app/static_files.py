@@ -0,0 +1,111 @@
+"""
+Static file serving with HTTP caching.
+
+Fuel photos, their variants and the company logo are stored under names
+derived from their content, so those URLs never change meaning and are served
+as immutable for a year. Everything else must be revalidated, which costs a
+304 thanks to the ETag. Compressible files are sent from a pre-compressed
+`.br` / `.gz` sibling when one exists and the client accepts it.
+"""
+import mimetypes
+import os
+import re
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+STATIC_ROOT = "app/static"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# Paths relative to the static root whose content never changes
+IMMUTABLE_PATTERNS = [
+    # Content-addressed fuel photos and their variants (ab/cd/<sha256>.<ext>)
+    re.compile(r"^fuel/(variants/[a-z]+/)?[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})\.\w+$"),
+    # Legacy fuel photos have random names and are never overwritten
+    re.compile(r"^fuel/(variants/[a-z]+/)?\d+_(ind|mac)_[0-9a-f]{8}\.\w+$"),
+    # Versioned company logo (logo-<hash>.<ext>)
+    re.compile(r"^logo-(?P<digest>[0-9a-f]{16})\.\w+$"),
+]
+
+COMPRESSIBLE_EXTENSIONS = {".svg", ".css", ".js", ".json", ".txt", ".html", ".xml", ".csv"}
+# Preferred first
+PRECOMPRESSED_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+def match_immutable(relative_path: str):
+    for pattern in IMMUTABLE_PATTERNS:
+        match = pattern.match(relative_path)
+        if match:
+            return match
+    return None
+
+def cache_headers(relative_path: str, stat_result: os.stat_result, encoding: str = None) -> dict:
+    """Cache-Control and a strong ETag for a file below the static root."""
+    relative_path = relative_path.replace(os.sep, "/").lstrip("/")
+    match = match_immutable(relative_path)
+    digest = match.groupdict().get("digest") if match else None
+    if digest:
+        # Same bytes on every replica, unlike an mtime-based tag
+        etag = digest
+    else:
+        etag = f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+    if encoding:
+        # A compressed representation is a different byte sequence
+        etag = f"{etag}-{encoding}"
+    return {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if match else REVALIDATE_CACHE_CONTROL,
+        "ETag": f'"{etag}"',
+    }
+
+def accepted_encodings(request_headers: Headers) -> set:
+    return {
+        part.split(";")[0].strip().lower()
+        for part in request_headers.get("accept-encoding", "").split(",")
+    }
+
+def is_not_modified(response_headers, request_headers: Headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    etag = response_headers["etag"]
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+
+def cached_file_response(full_path, request_headers: Headers, root: str = STATIC_ROOT,
+                         stat_result: os.stat_result = None, status_code: int = 200) -> Response:
+    """FileResponse with cache headers, a pre-compressed body when available, or a 304."""
+    full_path = str(full_path)
+    stat_result = stat_result or os.stat(full_path)
+    relative_path = os.path.relpath(full_path, root)
+    extension = os.path.splitext(full_path)[1].lower()
+    media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+    served_path, served_stat, encoding = full_path, stat_result, None
+    if extension in COMPRESSIBLE_EXTENSIONS:
+        accepted = accepted_encodings(request_headers)
+        for name, suffix in PRECOMPRESSED_ENCODINGS:
+            candidate = full_path + suffix
+            if name in accepted and os.path.isfile(candidate):
+                served_path, served_stat, encoding = candidate, os.stat(candidate), name
+                break
+
+    headers = cache_headers(relative_path, stat_result, encoding)
+    if extension in COMPRESSIBLE_EXTENSIONS:
+        headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    response = FileResponse(
+        served_path, status_code=status_code, headers=headers,
+        media_type=media_type, stat_result=served_stat
+    )
+    if is_not_modified(response.headers, request_headers):
+        return NotModifiedResponse(response.headers)
+    return response
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        return cached_file_response(
+            full_path, Headers(scope=scope), root=str(self.directory),
+            stat_result=stat_result, status_code=status_code
+        )
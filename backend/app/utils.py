@@ -1,4 +1,62 @@
-import math
+import numpy as np
+import pandas as pd
+
+# Radius of the Earth in km
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great circle distance in km between arrays of points
+    (specified in decimal degrees). NaN inputs yield NaN distances.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(dphi / 2)**2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2)**2
+
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+def batch_trip_distances(trip_ids, timestamps, lats, lons) -> dict:
+    """
+    Calculate the total distance of many trips at once.
+
+    Takes flat, equally long sequences of (trip_id, timestamp, lat, lon), one entry
+    per log in any order. Points are sorted by trip and timestamp, consecutive
+    pairs within the same trip are measured, and pairs with a missing coordinate
+    (None becomes NaN) are skipped. Returns {trip_id: distance_km} for every trip.
+    `timestamps` may be None when points are already in time order within each
+    trip (e.g. fetched with ORDER BY timestamp), which skips the timestamp sort.
+    """
+    trip_ids = np.asarray(trip_ids)
+    if trip_ids.size == 0:
+        return {}
+
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+
+    # lexsort uses the last key as the primary one; NaT becomes int64 min and sorts first
+    if timestamps is not None:
+        # pandas converts lists of datetimes far faster than np.asarray does
+        timestamps = pd.DatetimeIndex(timestamps).asi8
+        order = np.lexsort((timestamps, trip_ids))
+    else:
+        order = np.argsort(trip_ids, kind="stable")
+    trip_ids, lats, lons = trip_ids[order], lats[order], lons[order]
+
+    # Segment i joins point i to point i+1; drop segments crossing into the next trip
+    segments = haversine_np(lats[:-1], lons[:-1], lats[1:], lons[1:])
+    same_trip = trip_ids[:-1] == trip_ids[1:]
+    segments = np.where(same_trip & ~np.isnan(segments), segments, 0.0)
+
+    # Sum each trip's run of segments; the padding keeps one slot per point
+    starts = np.concatenate(([0], np.flatnonzero(~same_trip) + 1))
+    totals = np.add.reduceat(np.append(segments, 0.0), starts)
+
+    return dict(zip(trip_ids[starts].tolist(), totals.tolist()))
 
 def haversine(lat1, lon1, lat2, lon2):
     """
@@ -7,50 +65,25 @@ def haversine(lat1, lon1, lat2, lon2):
     """
     if lat1 is None or lon1 is None or lat2 is None or lon2 is None:
         return 0.0
-        
-    # Radius of the Earth in km
-    R = 6371.0
-    
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    
-    a = math.sin(dphi / 2)**2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-        
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
+
+    return float(haversine_np(lat1, lon1, lat2, lon2))
 
 def calculate_trip_distance(logs):
     """
     Calculate total distance of a trip based on its logs.
-    logs should be a list of TripLog objects or dicts with latitude/longitude.
+    logs should be a list of TripLog objects (or rows) with latitude/longitude/timestamp.
     """
     if not logs or len(logs) < 2:
         return 0.0
-    
-    total_distance = 0.0
-    # Sort logs by timestamp if they are objects, or rely on order if they are from DB relationship
-    # SQLAlchemy relationships are usually ordered by ID or whatever is defined, but let's be safe.
-    try:
-        sorted_logs = sorted(logs, key=lambda x: getattr(x, 'timestamp', 0))
-    except:
-        sorted_logs = logs
-
-    for i in range(len(sorted_logs) - 1):
-        l1 = sorted_logs[i]
-        l2 = sorted_logs[i+1]
-        
-        lat1 = getattr(l1, 'latitude', None)
-        lon1 = getattr(l1, 'longitude', None)
-        lat2 = getattr(l2, 'latitude', None)
-        lon2 = getattr(l2, 'longitude', None)
-        
-        if lat1 is not None and lat2 is not None:
-            total_distance += haversine(lat1, lon1, lat2, lon2)
-            
-    return total_distance
+
+    timestamps = [getattr(l, 'timestamp', None) for l in logs]
+    distances = batch_trip_distances(
+        [0] * len(logs),
+        timestamps if None not in timestamps else None,
+        [getattr(l, 'latitude', None) for l in logs],
+        [getattr(l, 'longitude', None) for l in logs],
+    )
+    return distances[0]
 
 def estimate_fuel_consumption(distance_km, car_plate=None):
     """
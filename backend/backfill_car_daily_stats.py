@@ -0,0 +1,31 @@
+"""
+One-Time Backfill Script: Car Daily Stats
+
+Rebuilds the car_daily_stats rollup used by the fuel reports from all trips
+and fuel logs. Trip and refill writes keep it current afterwards, so this only
+needs to run once after upgrading (it is safe to re-run).
+
+Run backfill_trip_distance.py first so trip distances are populated.
+
+Usage:
+    python backfill_car_daily_stats.py
+"""
+
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.services.rollup import rebuild_car_daily_stats
+
+def backfill_car_daily_stats():
+    db: Session = SessionLocal()
+    try:
+        rows = rebuild_car_daily_stats(db)
+        db.commit()
+        print(f"Rebuilt car_daily_stats: {rows} (car, day) rows.")
+    except Exception as e:
+        db.rollback()
+        print(f"Error during backfill: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_car_daily_stats()
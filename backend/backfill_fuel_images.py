@@ -0,0 +1,106 @@
+"""
+One-Time Backfill Script: Content-Addressed Fuel Images
+
+Moves fuel photos stored flat as app/static/fuel/<trip>_<kind>_<random>.png
+into the content-addressed layout (ab/cd/<sha256>.<ext>) used for new uploads,
+rewrites FuelLog.indicator_image_url / machine_image_url, and deletes the old
+files once the new URLs are committed. Identical photos collapse into one file.
+Safe to re-run; URLs already in the new layout are skipped.
+
+Usage:
+    python backfill_fuel_images.py
+"""
+
+import hashlib
+import os
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import FuelLog
+from app.services.fuel_images import (
+    FUEL_IMAGE_DIR, FUEL_IMAGE_URL_PREFIX, UPLOAD_CHUNK_SIZE,
+    content_path, image_extension, url_for
+)
+
+# Fuel logs migrated per query/commit
+BATCH_SIZE = 500
+
+def is_flat_url(url) -> bool:
+    """Legacy URLs point straight into FUEL_IMAGE_DIR without shard directories."""
+    return bool(url) and url.startswith(FUEL_IMAGE_URL_PREFIX + "/") and "/" not in url[len(FUEL_IMAGE_URL_PREFIX) + 1:]
+
+def migrate_file(url: str):
+    """Copy a legacy photo to its content address; returns the new URL, or None if the file is missing."""
+    old_path = os.path.join(FUEL_IMAGE_DIR, os.path.basename(url))
+    if not os.path.exists(old_path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(old_path, "rb") as f:
+        head = f.read(16)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    relative_path = content_path(digest.hexdigest(), image_extension(head))
+    new_path = os.path.join(FUEL_IMAGE_DIR, relative_path)
+    if not os.path.exists(new_path):
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        # Link rather than move, so the old URL keeps working until the commit
+        try:
+            os.link(old_path, new_path)
+        except OSError:
+            with open(old_path, "rb") as src, open(new_path, "wb") as dst:
+                for chunk in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+                    dst.write(chunk)
+    return url_for(relative_path)
+
+def backfill_fuel_images():
+    db: Session = SessionLocal()
+    try:
+        logs_updated = 0
+        files_migrated = 0
+        missing = 0
+        last_id = 0
+        while True:
+            logs = db.query(FuelLog).filter(
+                FuelLog.id > last_id,
+                or_(FuelLog.indicator_image_url.isnot(None), FuelLog.machine_image_url.isnot(None))
+            ).order_by(FuelLog.id).limit(BATCH_SIZE).all()
+            if not logs:
+                break
+            last_id = logs[-1].id
+
+            old_files = []
+            for log in logs:
+                changed = False
+                for column in ("indicator_image_url", "machine_image_url"):
+                    url = getattr(log, column)
+                    if not is_flat_url(url):
+                        continue
+                    new_url = migrate_file(url)
+                    if new_url is None:
+                        missing += 1
+                        continue
+                    setattr(log, column, new_url)
+                    old_files.append(os.path.join(FUEL_IMAGE_DIR, os.path.basename(url)))
+                    files_migrated += 1
+                    changed = True
+                logs_updated += changed
+
+            db.commit()
+            for path in old_files:
+                if os.path.exists(path):
+                    os.remove(path)
+            print(f"Processed fuel logs up to id {last_id}...")
+
+        print(f"Backfill complete. Migrated {files_migrated} images on {logs_updated} fuel logs ({missing} files missing).")
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error during backfill: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_fuel_images()
@@ -0,0 +1,56 @@
+"""
+One-Time Backfill Script: Trip Distances
+
+Fills the persisted trips.distance_km column from each trip's TripLogs.
+New logs keep the column up to date incrementally, so this only needs to run
+once after upgrading (it is safe to re-run; every trip is recomputed).
+
+Usage:
+    python backfill_trip_distance.py
+"""
+
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Trip, TripLog
+from app.utils import batch_trip_distances
+
+# Trips recomputed per query/commit
+BATCH_SIZE = 1000
+
+def backfill_trip_distances():
+    db: Session = SessionLocal()
+    try:
+        trips_updated = 0
+        last_id = 0
+        while True:
+            trip_ids = [row.id for row in db.query(Trip.id).filter(Trip.id > last_id).order_by(Trip.id).limit(BATCH_SIZE)]
+            if not trip_ids:
+                break
+            last_id = trip_ids[-1]
+
+            logs = db.query(TripLog.trip_id, TripLog.latitude, TripLog.longitude) \
+                .filter(TripLog.trip_id.in_(trip_ids)) \
+                .order_by(TripLog.trip_id, TripLog.timestamp) \
+                .all()
+            distances = {}
+            if logs:
+                log_trip_ids, lats, lons = zip(*logs)
+                distances = batch_trip_distances(log_trip_ids, None, lats, lons)
+
+            db.bulk_update_mappings(Trip, [
+                {"id": trip_id, "distance_km": distances.get(trip_id, 0.0)} for trip_id in trip_ids
+            ])
+            db.commit()
+            trips_updated += len(trip_ids)
+            print(f"Backfilled {trips_updated} trips...")
+
+        print(f"Backfill complete. Updated distance_km on {trips_updated} trips.")
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error during backfill: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_trip_distances()
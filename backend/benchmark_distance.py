@@ -0,0 +1,81 @@
+"""
+Microbenchmark: per-pair pure Python trip distances vs. the batch NumPy engine.
+
+Usage:
+    python benchmark_distance.py [trips] [logs_per_trip]
+"""
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app.utils import batch_trip_distances
+
+def legacy_haversine(lat1, lon1, lat2, lon2):
+    # Pure Python implementation that utils.haversine used before the NumPy engine
+    R = 6371.0
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+def legacy_trip_distances(trip_ids, timestamps, lats, lons):
+    # One sorted walk per trip, one point pair at a time
+    by_trip = {}
+    for point in zip(trip_ids, timestamps, lats, lons):
+        by_trip.setdefault(point[0], []).append(point)
+    totals = {}
+    for trip_id, points in by_trip.items():
+        points.sort(key=lambda p: p[1])
+        totals[trip_id] = sum(
+            legacy_haversine(a[2], a[3], b[2], b[3]) for a, b in zip(points, points[1:])
+        )
+    return totals
+
+def make_points(trips, logs_per_trip):
+    base = datetime(2026, 1, 1)
+    trip_ids, timestamps, lats, lons = [], [], [], []
+    for trip_id in range(trips):
+        for i in range(logs_per_trip):
+            trip_ids.append(trip_id)
+            timestamps.append(base + timedelta(days=trip_id, minutes=i))
+            lats.append(24.7 + random.uniform(-1, 1))
+            lons.append(46.7 + random.uniform(-1, 1))
+    # Shuffle so both implementations have to sort
+    points = list(zip(trip_ids, timestamps, lats, lons))
+    random.shuffle(points)
+    return [list(col) for col in zip(*points)]
+
+def bench(name, fn, args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>8}: {best * 1000:9.1f} ms")
+    return result
+
+def main():
+    trips = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    logs_per_trip = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    args = make_points(trips, logs_per_trip)
+    print(f"{trips} trips x {logs_per_trip} logs ({trips * logs_per_trip} points)")
+
+    print("Unsorted Python lists, sorted by (trip, timestamp):")
+    legacy = bench("legacy", legacy_trip_distances, args)
+    batch = bench("numpy", batch_trip_distances, args)
+    worst = max(abs(legacy[t] - batch[t]) for t in legacy)
+    print(f"max abs difference: {worst:.2e} km")
+
+    # The fuel report fetches logs already ordered by timestamp, as columns
+    trip_ids, timestamps, lats, lons = zip(*sorted(zip(*args), key=lambda p: p[1]))
+    arrays = (np.array(trip_ids), None, np.array(lats), np.array(lons))
+    print("Time-ordered NumPy columns (timestamps=None):")
+    batch = bench("numpy", batch_trip_distances, arrays)
+    worst = max(abs(legacy[t] - batch[t]) for t in legacy)
+    print(f"max abs difference: {worst:.2e} km")
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,25 @@ api.interceptors.response.use(
     }
 );
 
+export const newIdempotencyKey = () => (
+    window.crypto && window.crypto.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(16)}-${Math.random().toString(16).slice(2)}`
+);
+
+// POST a write that is retried on network failures under one Idempotency-Key,
+// so the server applies it at most once even if an earlier attempt got through
+const postIdempotent = async (url, data, config = {}, retries = 2) => {
+    const headers = { 'Idempotency-Key': newIdempotencyKey(), ...config.headers };
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await api.post(url, data, { ...config, headers });
+        } catch (error) {
+            if (error.response || attempt >= retries) throw error;
+        }
+    }
+};
+
 export const login = async (username, password) => {
     const formData = new FormData();
     formData.append('username', username);
@@ -39,7 +58,7 @@ export const login = async (username, password) => {
 };
 
 export const startTrip = async () => {
-    const response = await api.post('/trips/');
+    const response = await postIdempotent('/trips/');
     return response.data;
 };
 
@@ -56,7 +75,7 @@ export const getActiveTrip = async () => {
 }
 
 export const logTripState = async (tripId, state, latitude, longitude, address) => {
-    const response = await api.post(`/trips/${tripId}/logs`, {
+    const response = await postIdempotent(`/trips/${tripId}/logs`, {
         state,
         latitude,
         longitude,
@@ -65,6 +84,20 @@ export const logTripState = async (tripId, state, latitude, longitude, address)
     return response.data;
 };
 
+// Replay state changes captured offline; each event carries its own ISO timestamp.
+// Pass the same key for every retry of the same events so the server applies them once
+export const syncTripLogs = async (tripId, events, idempotencyKey) => {
+    const config = idempotencyKey ? { headers: { 'Idempotency-Key': idempotencyKey } } : {};
+    const response = await postIdempotent(`/trips/${tripId}/logs/batch`, { events }, config);
+    return response.data;
+};
+
+// Batched GPS positions recorded while a trip is in progress; re-sent points are ignored
+export const sendBreadcrumbs = async (tripId, points) => {
+    const response = await api.post(`/trips/${tripId}/breadcrumbs`, { points });
+    return response.data;
+};
+
 export const logFuelRefill = async (tripId, data) => {
     const formData = new FormData();
     formData.append('amount_liters', data.amount_liters);
@@ -74,7 +107,7 @@ export const logFuelRefill = async (tripId, data) => {
     formData.append('indicator_img', data.indicator_img);
     formData.append('machine_img', data.machine_img);
 
-    const response = await api.post(`/trips/${tripId}/fuel`, formData, {
+    const response = await postIdempotent(`/trips/${tripId}/fuel`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
     });
     return response.data;
@@ -85,8 +118,73 @@ export const updateLogAddress = async (tripId, logId, address) => {
     return response.data;
 };
 
-export const getTrips = async () => {
-    const response = await api.get('/admin/trips');
+// Trip path simplified for a map at the given zoom level
+export const getTripTrack = async (tripId, zoom = 14) => {
+    const response = await api.get(`/admin/trips/${tripId}/track`, { params: { zoom } });
+    return response.data;
+};
+
+// Latest state and position of each in-progress trip
+export const getLivePositions = async () => {
+    const response = await api.get('/admin/live-positions');
+    return response.data;
+};
+
+// Server-Sent Events feed of trip changes. EventSource cannot set headers, so it
+// connects with a short-lived, feed-only ticket in the URL instead of the token
+const LIVE_FEED_EVENTS = ['trip_started', 'trip_log', 'fuel_refill', 'trip_updated', 'trip_deleted'];
+const LIVE_FEED_RECONNECT_MS = 5000;
+
+export const openLiveFeed = (onEvent) => {
+    let source = null;
+    let closed = false;
+    let reconnectTimer = null;
+
+    const reconnectLater = () => {
+        if (!closed) reconnectTimer = setTimeout(connect, LIVE_FEED_RECONNECT_MS);
+    };
+
+    const connect = async () => {
+        try {
+            const response = await api.post('/admin/live-feed/ticket');
+            if (closed) return;
+            source = new EventSource(`${API_URL}/admin/live-feed?ticket=${encodeURIComponent(response.data.ticket)}`);
+            LIVE_FEED_EVENTS.forEach(type => {
+                source.addEventListener(type, (e) => onEvent(JSON.parse(e.data)));
+            });
+            source.addEventListener('error', () => {
+                // The browser retries with the same URL; once the ticket has expired it gives up, so fetch a new one
+                if (source.readyState === EventSource.CLOSED) reconnectLater();
+            });
+        } catch (err) {
+            console.error(err);
+            reconnectLater();
+        }
+    };
+
+    connect();
+    return {
+        close: () => {
+            closed = true;
+            clearTimeout(reconnectTimer);
+            if (source) source.close();
+        }
+    };
+};
+
+// One keyset page of trips, newest first; pass next_cursor back as params.cursor for the next page
+export const getTrips = async (params = {}) => {
+    const response = await api.get('/admin/trips', { params });
+    return response.data;
+};
+
+export const getTrip = async (tripId) => {
+    const response = await api.get(`/admin/trips/${tripId}`);
+    return response.data;
+};
+
+export const getTripStats = async () => {
+    const response = await api.get('/admin/trips/stats');
     return response.data;
 };
 
@@ -154,15 +252,20 @@ export const getDrivers = async () => {
 
 export const exportTrips = async (driverId = null, dateFrom = null, dateTo = null) => {
     try {
-        let url = '/admin/export?';
-        const params = new URLSearchParams();
-        if (driverId) params.append('driver_id', driverId);
-        if (dateFrom) params.append('start_date', dateFrom);
-        if (dateTo) params.append('end_date', dateTo);
-
-        url += params.toString();
+        const params = {};
+        if (driverId) params.driver_id = driverId;
+        if (dateFrom) params.start_date = dateFrom;
+        if (dateTo) params.end_date = dateTo;
+
+        // Exports are built in the background; poll the job until the file is ready
+        let job = (await api.post('/admin/export/jobs', null, { params })).data;
+        while (job.status === 'pending' || job.status === 'running') {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            job = (await api.get(`/admin/export/jobs/${job.id}`)).data;
+        }
+        if (job.status !== 'done') throw new Error(job.error || 'Export failed');
 
-        const response = await api.get(url, {
+        const response = await api.get(`/admin/export/jobs/${job.id}/download`, {
             responseType: 'blob'
         });
 
@@ -170,7 +273,7 @@ export const exportTrips = async (driverId = null, dateFrom = null, dateTo = nul
         const urlBlob = window.URL.createObjectURL(new Blob([response.data]));
         const link = document.createElement('a');
         link.href = urlBlob;
-        link.setAttribute('download', 'trips_export.xlsx');
+        link.setAttribute('download', job.filename || 'trips_export.xlsx');
         document.body.appendChild(link);
         link.click();
         link.remove();
@@ -180,10 +283,11 @@ export const exportTrips = async (driverId = null, dateFrom = null, dateTo = nul
     }
 };
 
-export const getDriverHistory = async (month = null, year = null) => {
-    const params = {};
+export const getDriverHistory = async (month = null, year = null, cursor = null, limit = 20) => {
+    const params = { limit };
     if (month) params.month = month;
     if (year) params.year = year;
+    if (cursor) params.cursor = cursor;
     const response = await api.get('/trips/history', { params });
     return response.data;
 };
@@ -228,8 +332,18 @@ export const saveBackupSettings = async (settings) => {
     return res.data;
 };
 
-export const getCarFuelReports = async () => {
-    const response = await api.get('/admin/car-fuel-reports');
+export const getCarFuelReports = async (startDate = null, endDate = null) => {
+    const params = {};
+    if (startDate) params.start_date = startDate;
+    if (endDate) params.end_date = endDate;
+    const response = await api.get('/admin/car-fuel-reports', { params });
+    return response.data;
+};
+
+export const getCarFuelLogs = async (carId, cursor = null, limit = 50) => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    const response = await api.get(`/admin/cars/${carId}/fuel-logs`, { params });
     return response.data;
 };
 
@@ -1,5 +1,5 @@
-import React, { useEffect, useState, useMemo } from 'react';
-import { getTrips, exportTrips, createDriver, getDrivers, updateDriver, deleteDriver, changeAdminPassword, getCars, createCar, deleteCar, deleteTrip, updateTrip, getSettings, updateSettings, uploadLogo, getBackups, createBackup, restoreBackup, saveBackupSettings, getCarFuelReports } from '../api';
+import React, { useEffect, useState, useMemo, useRef } from 'react';
+import { getTrips, getTrip, getTripStats, exportTrips, createDriver, getDrivers, updateDriver, deleteDriver, changeAdminPassword, getCars, createCar, deleteCar, deleteTrip, updateTrip, getSettings, updateSettings, uploadLogo, getBackups, createBackup, restoreBackup, saveBackupSettings, getCarFuelReports, getCarFuelLogs, openLiveFeed, getLivePositions } from '../api';
 import { useNavigate } from 'react-router-dom';
 import { Download, LayoutDashboard, LogOut, UserPlus, Car, Users, Trash2, Edit, Save, X, Lock, PlusCircle, MapPin, Settings, Upload, Globe, Menu, BarChart3, Activity, Clock, TrendingUp, Truck, CheckCircle2, Database, RotateCcw, Play, PlayCircle, Home, Calendar, Plus, ExternalLink, Droplets, Camera, History } from 'lucide-react';
 import { useLanguage } from '../contexts/LanguageContext';
@@ -10,7 +10,7 @@ const CHART_COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#e
 // ══════════════════════════════════════════════════════════════
 // DashboardView — Analytics Sub-component
 // ══════════════════════════════════════════════════════════════
-const DashboardView = ({ trips, drivers, cars, t, isRtl, formatSaudiDate, setViewMode, setStatusFilter, setDateFrom, setDateTo, setSelectedTrip, setShowDetailsModal }) => {
+const DashboardView = ({ trips, stats, livePositions, drivers, cars, t, isRtl, formatSaudiDate, setViewMode, setStatusFilter, setDateFrom, setDateTo, setSelectedTrip, setShowDetailsModal }) => {
 
     // Helper to parse naive Saudi dates (UTC+3) correctly regardless of browser TZ
     const parseSaudiDate = (dateStr) => {
@@ -30,22 +30,12 @@ const DashboardView = ({ trips, drivers, cars, t, isRtl, formatSaudiDate, setVie
     }, [trips]); // Re-calculate when trips change (usually on refresh/polling)
 
     // ── KPI Calculations ──
-    const today = new Date(nowSaudi); today.setHours(0, 0, 0, 0);
-    const totalTrips = trips.length;
-    const activeTrips = trips.filter(tr => tr.status === 'IN_PROGRESS').length;
-    const completedTrips = trips.filter(tr => tr.status === 'COMPLETED').length;
-    const tripsToday = trips.filter(tr => {
-        const d = parseSaudiDate(tr.start_date);
-        if (!d) return false;
-        d.setHours(0, 0, 0, 0);
-        return d.getTime() === today.getTime();
-    }).length;
-
-    const tripsThisMonth = trips.filter(tr => {
-        const d = parseSaudiDate(tr.start_date);
-        if (!d) return false;
-        return d.getMonth() === today.getMonth() && d.getFullYear() === today.getFullYear();
-    }).length;
+    // Counters come from the server; `trips` only holds active and recent trips
+    const totalTrips = stats.total;
+    const activeTrips = stats.active;
+    const completedTrips = stats.completed;
+    const tripsToday = stats.today;
+    const tripsThisMonth = stats.this_month;
 
     // ── Trip Status Breakdown ──
     const statusData = [
@@ -106,15 +96,22 @@ const DashboardView = ({ trips, drivers, cars, t, isRtl, formatSaudiDate, setVie
         const activeTrips = trips.filter(tr => tr.status === 'IN_PROGRESS');
         const carTripMap = {};
 
+        // Prefer the server's live registry; fall back to scanning the trip's logs
+        const latestState = (tr) => {
+            const live = livePositions[tr.id];
+            if (live) return live.state;
+            if (tr.logs && tr.logs.length > 0) {
+                const sortedLogs = [...tr.logs].sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
+                return sortedLogs[0].state;
+            }
+            return null;
+        };
+
         activeTrips.forEach(tr => {
             const plate = tr.car?.plate || tr.driver?.car?.plate || tr.driver?.car_plate;
             if (!plate) return;
 
-            let state = 'READY'; // default: no logs = ready to depart
-            if (tr.logs && tr.logs.length > 0) {
-                const sortedLogs = [...tr.logs].sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-                state = sortedLogs[0].state;
-            }
+            const state = latestState(tr) || 'READY'; // default: no logs = ready to depart
             carTripMap[plate] = { trip: tr, state };
         });
 
@@ -139,11 +136,7 @@ const DashboardView = ({ trips, drivers, cars, t, isRtl, formatSaudiDate, setVie
         activeTrips.forEach(tr => {
             const plate = tr.car?.plate || tr.driver?.car?.plate || tr.driver?.car_plate;
             if (!plate) {
-                let state = 'ready';
-                if (tr.logs && tr.logs.length > 0) {
-                    const sortedLogs = [...tr.logs].sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-                    state = sortedLogs[0].state;
-                }
+                const state = latestState(tr) || 'ready';
                 if (state === 'ready') readyToDepart.push(tr);
                 else if (state === 'ARRIVE_FACTORY') returnedToFactory.push(tr);
                 else if (state === 'EXIT_FACTORY') outbound.push(tr);
@@ -154,7 +147,7 @@ const DashboardView = ({ trips, drivers, cars, t, isRtl, formatSaudiDate, setVie
         });
 
         return { readyToDepart, returnedToFactory, atWarehouse, outbound, inbound };
-    }, [trips, cars]);
+    }, [trips, cars, livePositions]);
 
     const [selectedStatusFilter, setSelectedStatusFilter] = useState(null);
 
@@ -211,33 +204,18 @@ const DashboardView = ({ trips, drivers, cars, t, isRtl, formatSaudiDate, setVie
     
     // ── Monthly Analytics Data ──
     const monthlyData = useMemo(() => {
-        const counts = {};
-        trips.forEach(t => {
-            if (!t.start_date) return;
-            const d = new Date(t.start_date.endsWith('Z') ? t.start_date : t.start_date + 'Z');
-            const year = d.getUTCFullYear();
-            const month = d.getUTCMonth() + 1;
-            const key = `${year}-${month}`;
-            counts[key] = (counts[key] || 0) + 1;
-        });
-        
         const monthNames = [
             'january', 'february', 'march', 'april', 'may', 'june',
             'july', 'august', 'september', 'october', 'november', 'december'
         ];
 
-        return Object.entries(counts)
-            .map(([key, count]) => {
-                const [y, m] = key.split('-');
-                return { 
-                    year: parseInt(y), 
-                    month: parseInt(m), 
-                    monthLabel: t(monthNames[parseInt(m) - 1]),
-                    count 
-                };
-            })
-            .sort((a, b) => (b.year - a.year) || (b.month - a.month));
-    }, [trips, t]);
+        return (stats.monthly || []).map(({ year, month, count }) => ({
+            year,
+            month,
+            monthLabel: t(monthNames[month - 1]),
+            count
+        }));
+    }, [stats, t]);
 
     const formatTimeMetric = (minutes) => {
         if (minutes === null || minutes === undefined) return '—';
@@ -637,6 +615,9 @@ const FuelView = ({ t, isRtl }) => {
     const [reports, setReports] = useState([]);
     const [loading, setLoading] = useState(true);
     const [selectedCarHistory, setSelectedCarHistory] = useState(null);
+    const [carFuelLogs, setCarFuelLogs] = useState([]);
+    const [fuelLogsCursor, setFuelLogsCursor] = useState(null);
+    const [fuelLogsLoading, setFuelLogsLoading] = useState(false);
     const [selectedFuelLog, setSelectedFuelLog] = useState(null);
 
     useEffect(() => {
@@ -655,6 +636,27 @@ const FuelView = ({ t, isRtl }) => {
         }
     };
 
+    // Refills are paged from the server; each page appends to the open car's history
+    const loadCarFuelLogs = async (carId, cursor = null) => {
+        setFuelLogsLoading(true);
+        try {
+            const page = await getCarFuelLogs(carId, cursor);
+            setCarFuelLogs(prev => cursor ? [...prev, ...page.items] : page.items);
+            setFuelLogsCursor(page.next_cursor);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setFuelLogsLoading(false);
+        }
+    };
+
+    const openCarHistory = (report) => {
+        setSelectedCarHistory(report);
+        setCarFuelLogs([]);
+        setFuelLogsCursor(null);
+        loadCarFuelLogs(report.car_id);
+    };
+
     if (loading) return <div className="flex justify-center p-12"><RotateCcw className="animate-spin text-blue-600" size={48} /></div>;
 
     return (
@@ -696,10 +698,10 @@ const FuelView = ({ t, isRtl }) => {
                                 </td>
                                 <td className="px-6 py-4 text-center">
                                     <button 
-                                        onClick={() => setSelectedCarHistory(report)}
+                                        onClick={() => openCarHistory(report)}
                                         className="px-4 py-2 bg-blue-600 text-white rounded-xl text-xs font-bold hover:bg-blue-700 shadow-md transition flex items-center gap-2 mx-auto"
                                     >
-                                        <History size={14} /> {t('viewHistory')} ({report.fuel_logs.length})
+                                        <History size={14} /> {t('viewHistory')} ({report.refill_count})
                                     </button>
                                 </td>
                             </tr>
@@ -733,7 +735,7 @@ const FuelView = ({ t, isRtl }) => {
                                     </tr>
                                 </thead>
                                 <tbody className="divide-y divide-gray-100">
-                                    {selectedCarHistory.fuel_logs.map((log) => (
+                                    {carFuelLogs.map((log) => (
                                         <tr key={log.id} className="hover:bg-gray-50 transition-colors">
                                             <td className="px-6 py-4 text-sm font-mono whitespace-nowrap">
                                                 {new Date(log.timestamp).toLocaleString(isRtl ? 'ar-SA' : 'en-US')}
@@ -757,7 +759,7 @@ const FuelView = ({ t, isRtl }) => {
                                             </td>
                                         </tr>
                                     ))}
-                                    {selectedCarHistory.fuel_logs.length === 0 && (
+                                    {carFuelLogs.length === 0 && !fuelLogsLoading && (
                                         <tr>
                                             <td colSpan="5" className="px-6 py-12 text-center text-gray-400 italic">
                                                 {t('noLogsYet')}
@@ -766,6 +768,19 @@ const FuelView = ({ t, isRtl }) => {
                                     )}
                                 </tbody>
                             </table>
+                            {fuelLogsLoading && (
+                                <div className="flex justify-center p-6"><RotateCcw className="animate-spin text-blue-600" size={24} /></div>
+                            )}
+                            {fuelLogsCursor && !fuelLogsLoading && (
+                                <div className="flex justify-center p-4">
+                                    <button
+                                        onClick={() => loadCarFuelLogs(selectedCarHistory.car_id, fuelLogsCursor)}
+                                        className="px-4 py-2 bg-gray-100 text-gray-700 rounded-xl text-xs font-bold hover:bg-gray-200 transition"
+                                    >
+                                        {t('loadMore')}
+                                    </button>
+                                </div>
+                            )}
                         </div>
                     </div>
                 </div>
@@ -784,7 +799,10 @@ const FuelView = ({ t, isRtl }) => {
                                 <label className="text-sm font-bold text-gray-400 uppercase tracking-widest">{t('indicator')}</label>
                                 <div className="rounded-2xl overflow-hidden shadow-2xl border-4 border-slate-50 aspect-video bg-slate-100 flex items-center justify-center">
                                     {selectedFuelLog.indicator_img ? (
-                                        <img src={selectedFuelLog.indicator_img} className="w-full h-full object-cover" />
+                                        // Mid-size preview; the full photo opens in a new tab
+                                        <a href={selectedFuelLog.indicator_img} target="_blank" rel="noopener noreferrer" className="w-full h-full">
+                                            <img src={selectedFuelLog.indicator_medium || selectedFuelLog.indicator_img} loading="lazy" className="w-full h-full object-cover" />
+                                        </a>
                                     ) : <Camera className="text-gray-300" size={64} />}
                                 </div>
                             </div>
@@ -792,7 +810,10 @@ const FuelView = ({ t, isRtl }) => {
                                 <label className="text-sm font-bold text-gray-400 uppercase tracking-widest">{t('machine')}</label>
                                 <div className="rounded-2xl overflow-hidden shadow-2xl border-4 border-slate-50 aspect-video bg-slate-100 flex items-center justify-center">
                                     {selectedFuelLog.machine_img ? (
-                                        <img src={selectedFuelLog.machine_img} className="w-full h-full object-cover" />
+                                        // Mid-size preview; the full photo opens in a new tab
+                                        <a href={selectedFuelLog.machine_img} target="_blank" rel="noopener noreferrer" className="w-full h-full">
+                                            <img src={selectedFuelLog.machine_medium || selectedFuelLog.machine_img} loading="lazy" className="w-full h-full object-cover" />
+                                        </a>
                                     ) : <Camera className="text-gray-300" size={64} />}
                                 </div>
                             </div>
@@ -978,12 +999,22 @@ const AdminDashboard = () => {
         localStorage.setItem('driverLanguage', nextLang);
     };
 
+    // Trips tab: server-filtered keyset pages, appended on "load more"
     const [trips, setTrips] = useState([]);
+    const [tripsCursor, setTripsCursor] = useState(null);
+    const [tripsLoading, setTripsLoading] = useState(false);
+    // Dashboard: active and recent trips only, counters come from the server
+    const [dashboardTrips, setDashboardTrips] = useState([]);
+    const [tripStats, setTripStats] = useState({ total: 0, active: 0, completed: 0, today: 0, this_month: 0, monthly: [] });
+    const [livePositions, setLivePositions] = useState({});
     const [drivers, setDrivers] = useState([]);
     const [cars, setCars] = useState([]);
     const [settings, setSettings] = useState({ companyName: '', logoUrl: '' });
     const [viewMode, setViewMode] = useState('dashboard');
     const [selectedDriver, setSelectedDriver] = useState('');
+    const [dateFrom, setDateFrom] = useState('');
+    const [dateTo, setDateTo] = useState('');
+    const [statusFilter, setStatusFilter] = useState('all');
 
     // Driver Form State
     const [showDriverForm, setShowDriverForm] = useState(false);
@@ -1042,13 +1073,93 @@ const AdminDashboard = () => {
 
     useEffect(() => {
         // Direction is now managed by LanguageContext
-        fetchTrips();
+        fetchDashboardTrips();
         fetchDrivers();
         fetchCars();
         fetchSettings();
         fetchBackups();
     }, []);
 
+    // Filters are applied server-side, so changing one reloads the first page
+    useEffect(() => {
+        fetchTrips();
+    }, [statusFilter, selectedDriver, dateFrom, dateTo]);
+
+    // Apply live trip deltas instead of re-downloading the trip list
+    const liveTripTimers = useRef({});
+    const livePositionsTimer = useRef(null);
+    useEffect(() => {
+        // New or edited trips carry more than a delta can describe, so re-read just that trip
+        const refetchTripSoon = (tripId, isNew) => {
+            clearTimeout(liveTripTimers.current[tripId]);
+            liveTripTimers.current[tripId] = setTimeout(async () => {
+                delete liveTripTimers.current[tripId];
+                try {
+                    const trip = await getTrip(tripId);
+                    updateTripLists(prev => prev.some(tr => tr.id === trip.id)
+                        ? prev.map(tr => tr.id === trip.id ? trip : tr)
+                        : (isNew ? [trip, ...prev] : prev));
+                } catch (err) { console.error(err); }
+            }, 500);
+        };
+        fetchLivePositions();
+        const source = openLiveFeed((event) => {
+            // The registry is small, so re-read it after a burst of events
+            clearTimeout(livePositionsTimer.current);
+            livePositionsTimer.current = setTimeout(fetchLivePositions, 1000);
+
+            if (event.type === 'trip_deleted') {
+                updateTripLists(prev => prev.filter(trip => trip.id !== event.trip_id));
+                adjustTripStats(event.timestamp, -1, event.status === 'IN_PROGRESS' ? { active: -1 } : { completed: -1 });
+            } else if (event.type === 'trip_started') {
+                refetchTripSoon(event.trip_id, true);
+                adjustTripStats(event.timestamp, 1, { active: 1 });
+            } else if (event.type === 'trip_log') {
+                if (event.state === 'ARRIVE_FACTORY' && event.status === 'COMPLETED') {
+                    adjustTripStats(null, 0, { active: -1, completed: 1 });
+                }
+                const column = event.state.toLowerCase();
+                updateTripLists(prev => prev.map(trip => trip.id !== event.trip_id ? trip : {
+                    ...trip,
+                    status: event.status,
+                    [`${column}_time`]: event.timestamp,
+                    [`${column}_address`]: event.address,
+                    logs: [...(trip.logs || []), {
+                        trip_id: event.trip_id,
+                        state: event.state,
+                        timestamp: event.timestamp,
+                        latitude: event.latitude,
+                        longitude: event.longitude,
+                        address: event.address
+                    }]
+                }));
+            } else if (event.type === 'fuel_refill') {
+                updateTripLists(prev => prev.map(trip => trip.id !== event.trip_id ? trip : {
+                    ...trip,
+                    fuel_logs: [...(trip.fuel_logs || []), {
+                        id: event.fuel_log_id,
+                        trip_id: event.trip_id,
+                        driver_id: event.driver_id,
+                        amount_liters: event.amount_liters,
+                        indicator_image_url: event.indicator_image_url,
+                        machine_image_url: event.machine_image_url,
+                        timestamp: event.timestamp,
+                        latitude: event.latitude,
+                        longitude: event.longitude,
+                        address: event.address
+                    }]
+                }));
+            } else if (event.type === 'trip_updated') {
+                refetchTripSoon(event.trip_id, false);
+            }
+        });
+        return () => {
+            source.close();
+            Object.values(liveTripTimers.current).forEach(clearTimeout);
+            clearTimeout(livePositionsTimer.current);
+        };
+    }, []);
+
     useEffect(() => {
         if (carForm.plate === '9728' || carForm.plate === '9573') {
             setCarForm(prev => ({ ...prev, fuelCapacity: '800' }));
@@ -1062,7 +1173,7 @@ const AdminDashboard = () => {
             const data = await getSettings();
             setSettings({
                 companyName: data.company_name || t('adminDashboard'),
-                logoUrl: data.company_logo ? `${data.company_logo}?t=${new Date().getTime()}` : ''
+                logoUrl: data.company_logo || ''
             });
             setBrandingForm({ companyName: data.company_name || '' });
             setBackupSettings({
@@ -1076,8 +1187,100 @@ const AdminDashboard = () => {
         try { setBackups(await getBackups()); } catch (err) { console.error(err); }
     };
 
+    const TRIPS_PAGE_SIZE = 50;
+    const DASHBOARD_RECENT_DAYS = 3;
+
+    const tripFilterParams = () => {
+        const params = { limit: TRIPS_PAGE_SIZE };
+        if (statusFilter !== 'all') params.status = statusFilter;
+        if (selectedDriver) params.driver_id = selectedDriver;
+        if (dateFrom) params.start_date = dateFrom;
+        if (dateTo) params.end_date = dateTo;
+        return params;
+    };
+
     const fetchTrips = async () => {
-        try { setTrips(await getTrips()); } catch (err) { console.error(err); }
+        setTripsLoading(true);
+        try {
+            const page = await getTrips(tripFilterParams());
+            setTrips(page.items);
+            setTripsCursor(page.next_cursor);
+            setCurrentPage(1);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setTripsLoading(false);
+        }
+    };
+
+    const loadMoreTrips = async () => {
+        setTripsLoading(true);
+        try {
+            const page = await getTrips({ ...tripFilterParams(), cursor: tripsCursor });
+            setTrips(prev => {
+                const loaded = new Set(prev.map(trip => trip.id));
+                return [...prev, ...page.items.filter(trip => !loaded.has(trip.id))];
+            });
+            setTripsCursor(page.next_cursor);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setTripsLoading(false);
+        }
+    };
+
+    // Vehicle status, activity and inactivity widgets only need active and recent trips
+    const fetchDashboardTrips = async () => {
+        try {
+            const since = new Date(Date.now() - DASHBOARD_RECENT_DAYS * 24 * 3600000).toISOString().slice(0, 10);
+            const [active, recent, stats] = await Promise.all([
+                getTrips({ status: 'IN_PROGRESS', limit: 500 }),
+                getTrips({ start_date: since, limit: 500 }),
+                getTripStats()
+            ]);
+            const byId = new Map([...recent.items, ...active.items].map(trip => [trip.id, trip]));
+            setDashboardTrips([...byId.values()].sort((a, b) => b.id - a.id));
+            setTripStats(stats);
+        } catch (err) { console.error(err); }
+    };
+
+    const refreshTrips = () => {
+        fetchTrips();
+        fetchDashboardTrips();
+    };
+
+    const updateTripLists = (update) => {
+        setTrips(update);
+        setDashboardTrips(update);
+    };
+
+    // Keep the dashboard counters current between /trips/stats reads. `startDate` is
+    // the trip's naive Saudi start time; `total` is added to every counter it falls in
+    const adjustTripStats = (startDate, total, statusCounts) => {
+        setTripStats(prev => {
+            const next = { ...prev, total: prev.total + total };
+            Object.entries(statusCounts).forEach(([key, delta]) => { next[key] = Math.max(0, prev[key] + delta); });
+            if (startDate && total) {
+                const [year, month] = startDate.slice(0, 7).split('-').map(Number);
+                const saudiNow = new Date(Date.now() + 3 * 3600000).toISOString();
+                if (startDate.slice(0, 10) === saudiNow.slice(0, 10)) next.today = prev.today + total;
+                if (startDate.slice(0, 7) === saudiNow.slice(0, 7)) next.this_month = prev.this_month + total;
+                const known = prev.monthly.some(m => m.year === year && m.month === month);
+                if (known) {
+                    next.monthly = prev.monthly.map(m => m.year === year && m.month === month ? { ...m, count: m.count + total } : m);
+                } else if (total > 0) {
+                    next.monthly = [{ year, month, count: total }, ...prev.monthly];
+                }
+            }
+            return next;
+        });
+    };
+
+    const fetchLivePositions = async () => {
+        try {
+            const positions = await getLivePositions();
+            setLivePositions(Object.fromEntries(positions.map(p => [p.trip_id, p])));
+        } catch (err) { console.error(err); }
     };
 
     const fetchDrivers = async () => {
@@ -1147,7 +1350,7 @@ const AdminDashboard = () => {
             try {
                 await restoreBackup(filename);
                 setMessage(`Database restored from ${filename} successfully`);
-                fetchTrips();
+                refreshTrips();
                 fetchDrivers();
                 fetchCars();
             } catch (err) {
@@ -1251,7 +1454,7 @@ const AdminDashboard = () => {
                 await deleteDriver(id);
                 setMessage(t('driverDeleted'));
                 fetchDrivers();
-                fetchTrips();
+                refreshTrips();
                 fetchCars();
             } catch (err) {
                 setMessage(t('failedDeleteDriver'));
@@ -1264,6 +1467,7 @@ const AdminDashboard = () => {
             try {
                 await deleteTrip(id);
                 setMessage(t('tripDeleted'));
+                // The live feed's trip_deleted event updates the dashboard
                 fetchTrips();
             } catch (err) {
                 setMessage(t('failedDeleteTrip'));
@@ -1343,15 +1547,13 @@ const AdminDashboard = () => {
             });
             setMessage(t('tripUpdated'));
             setShowTripEditForm(false);
+            // The live feed's trip_updated event updates the dashboard
             fetchTrips();
         } catch (err) {
             setMessage(t('failedUpdateTrip'));
         }
     };
 
-    const [dateFrom, setDateFrom] = useState('');
-    const [dateTo, setDateTo] = useState('');
-    const [statusFilter, setStatusFilter] = useState('all');
 
     const handleExport = () => exportTrips(selectedDriver || null, dateFrom || null, dateTo || null);
 
@@ -1942,7 +2144,7 @@ const AdminDashboard = () => {
                 )}
 
                 {/* ═══ ANALYTICS DASHBOARD ═══ */}
-                {viewMode === 'dashboard' && <DashboardView trips={trips} drivers={drivers} cars={cars} t={t} isRtl={isRtl} formatSaudiDate={formatSaudiDate} setViewMode={setViewMode} setStatusFilter={setStatusFilter} setDateFrom={setDateFrom} setDateTo={setDateTo} setSelectedTrip={setSelectedTrip} setShowDetailsModal={setShowDetailsModal} />}
+                {viewMode === 'dashboard' && <DashboardView trips={dashboardTrips} stats={tripStats} livePositions={livePositions} drivers={drivers} cars={cars} t={t} isRtl={isRtl} formatSaudiDate={formatSaudiDate} setViewMode={setViewMode} setStatusFilter={setStatusFilter} setDateFrom={setDateFrom} setDateTo={setDateTo} setSelectedTrip={setSelectedTrip} setShowDetailsModal={setShowDetailsModal} />}
 
                 {viewMode === 'excel' && (
                     <ExcelView trips={displayedTrips} t={t} isRtl={isRtl} formatSaudiDate={formatSaudiDate} />
@@ -2039,6 +2241,17 @@ const AdminDashboard = () => {
                                 </div>
                             </div>
                         )}
+                        {tripsCursor && (
+                            <div className="flex justify-center p-4 border-t border-gray-200">
+                                <button
+                                    onClick={loadMoreTrips}
+                                    disabled={tripsLoading}
+                                    className="px-4 py-2 bg-gray-100 text-gray-700 rounded-xl text-xs font-bold hover:bg-gray-200 transition disabled:opacity-50"
+                                >
+                                    {t('loadMore')}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 )}
 
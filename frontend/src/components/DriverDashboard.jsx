@@ -1,10 +1,45 @@
-import React, { useState, useEffect } from 'react';
-import { startTrip, logTripState, getActiveTrip, getSettings, logFuelRefill, updateLogAddress } from '../api';
+import React, { useState, useEffect, useRef } from 'react';
+import { startTrip, logTripState, syncTripLogs, newIdempotencyKey, getActiveTrip, getSettings, logFuelRefill, sendBreadcrumbs } from '../api';
 import { useNavigate } from 'react-router-dom';
 import { MapPin, Navigation, CheckCircle, LogOut, Truck, Home, PlayCircle, RotateCcw, History, Activity, Languages, Droplets, Camera, X } from 'lucide-react';
 import DriverHistory from './DriverHistory';
 import { useLanguage } from '../contexts/LanguageContext';
 
+// Breadcrumbs are buffered on the phone and uploaded in batches
+const BREADCRUMB_FLUSH_MS = 30000;
+const MAX_BUFFERED_BREADCRUMBS = 1000;
+
+// State changes made without signal are kept on the phone and replayed in one
+// /logs/batch request, with the times they actually happened
+const PENDING_LOGS_KEY = 'pendingTripLogs';
+const PENDING_LOGS_RETRY_MS = 30000;
+
+const loadPendingLogs = () => {
+    try {
+        return JSON.parse(localStorage.getItem(PENDING_LOGS_KEY));
+    } catch {
+        return null;
+    }
+};
+
+const savePendingLogs = (pending) => {
+    if (pending && pending.events.length > 0) {
+        localStorage.setItem(PENDING_LOGS_KEY, JSON.stringify(pending));
+    } else {
+        localStorage.removeItem(PENDING_LOGS_KEY);
+    }
+};
+
+// Button to show after the trip's last logged state
+const nextStateAfter = (lastState) => {
+    if (lastState === 'EXIT_FACTORY') return 'ARRIVE_WAREHOUSE';
+    if (lastState === 'ARRIVE_WAREHOUSE') return 'EXIT_WAREHOUSE';
+    if (lastState === 'EXIT_WAREHOUSE') return 'choice';
+    if (lastState === 'ARRIVE_FACTORY') return 'COMPLETED';
+    // No logs yet, or an unrecognized state
+    return 'EXIT_FACTORY';
+};
+
 const DriverDashboard = () => {
     const { t, toggleLanguage, language } = useLanguage();
     const [activeTrip, setActiveTrip] = useState(null);
@@ -18,6 +53,9 @@ const DriverDashboard = () => {
     const [fuelForm, setFuelForm] = useState({ amount: '', indicatorImg: null, machineImg: null });
     const [fuelLoading, setFuelLoading] = useState(false);
     const [fuelError, setFuelError] = useState('');
+    const breadcrumbBuffer = useRef([]);
+    const [pendingCount, setPendingCount] = useState(() => loadPendingLogs()?.events.length || 0);
+    const flushingLogs = useRef(false);
     const navigate = useNavigate();
 
     useEffect(() => {
@@ -35,12 +73,67 @@ const DriverDashboard = () => {
         fetchSettings();
     }, []);
 
+    // Replay offline state changes as soon as the phone is back online
+    useEffect(() => {
+        flushPendingLogs();
+        window.addEventListener('online', flushPendingLogs);
+        const timer = setInterval(flushPendingLogs, PENDING_LOGS_RETRY_MS);
+        return () => {
+            window.removeEventListener('online', flushPendingLogs);
+            clearInterval(timer);
+        };
+    }, []);
+
+    // Track the truck's position while a trip is in progress
+    const activeTripId = activeTrip?.id;
+    useEffect(() => {
+        if (!activeTripId || !navigator.geolocation) return undefined;
+
+        const watchId = navigator.geolocation.watchPosition(
+            (position) => {
+                const { latitude, longitude, speed } = position.coords;
+                breadcrumbBuffer.current.push({
+                    timestamp: new Date(position.timestamp).toISOString(),
+                    latitude,
+                    longitude,
+                    speed_kmh: speed != null ? speed * 3.6 : null
+                });
+                if (breadcrumbBuffer.current.length > MAX_BUFFERED_BREADCRUMBS) {
+                    breadcrumbBuffer.current.splice(0, breadcrumbBuffer.current.length - MAX_BUFFERED_BREADCRUMBS);
+                }
+            },
+            (err) => console.error(err),
+            { enableHighAccuracy: true, maximumAge: 5000 }
+        );
+
+        const flush = async () => {
+            const points = breadcrumbBuffer.current;
+            if (points.length === 0) return;
+            breadcrumbBuffer.current = [];
+            try {
+                await sendBreadcrumbs(activeTripId, points);
+            } catch (err) {
+                // Keep the points for the next attempt unless the trip is over
+                if (!err.response || err.response.status >= 500) {
+                    breadcrumbBuffer.current = points.concat(breadcrumbBuffer.current).slice(-MAX_BUFFERED_BREADCRUMBS);
+                }
+            }
+        };
+        const timer = setInterval(flush, BREADCRUMB_FLUSH_MS);
+
+        return () => {
+            navigator.geolocation.clearWatch(watchId);
+            clearInterval(timer);
+            flush();
+        };
+    }, [activeTripId]);
+
     const fetchSettings = async () => {
         try {
             const data = await getSettings();
             setSettings({
                 companyName: data.company_name || t('driverPanel'),
-                logoUrl: data.company_logo ? `${data.company_logo}?t=${new Date().getTime()}` : ''
+                logoUrl: data.company_logo || ''
             });
         } catch (err) { console.error(err); }
     };
@@ -49,22 +142,18 @@ const DriverDashboard = () => {
         try {
             const trip = await getActiveTrip();
             if (trip) {
-                setActiveTrip(trip);
                 const lastLog = trip.logs && trip.logs.length > 0 ? trip.logs[trip.logs.length - 1] : null;
+                // Events still waiting on the phone are newer than anything the server has
+                const pending = loadPendingLogs();
+                const queued = pending && pending.tripId === trip.id ? pending.events[pending.events.length - 1] : null;
+                const lastState = queued ? queued.state : lastLog?.state;
 
-                if (!lastLog) {
-                    setNextState('EXIT_FACTORY');
-                } else if (lastLog.state === 'EXIT_FACTORY') {
-                    setNextState('ARRIVE_WAREHOUSE');
-                } else if (lastLog.state === 'ARRIVE_WAREHOUSE') {
-                    setNextState('EXIT_WAREHOUSE');
-                } else if (lastLog.state === 'EXIT_WAREHOUSE') {
-                    setNextState('choice');
-                } else if (lastLog.state === 'ARRIVE_FACTORY') {
+                if (queued && lastState === 'ARRIVE_FACTORY') {
+                    setActiveTrip(null);
                     setNextState('COMPLETED');
                 } else {
-                    // Fallback for any unrecognized state
-                    setNextState('EXIT_FACTORY');
+                    setActiveTrip(trip);
+                    setNextState(nextStateAfter(lastState));
                 }
             } else {
                 // No active trip — reset state
@@ -79,9 +168,46 @@ const DriverDashboard = () => {
         }
     };
 
+    const queuePendingLog = (tripId, event) => {
+        const pending = loadPendingLogs();
+        const events = pending && pending.tripId === tripId ? pending.events : [];
+        // New content needs a new key, or the server would replay the earlier batch's response
+        savePendingLogs({ tripId, key: newIdempotencyKey(), events: [...events, event] });
+        setPendingCount(events.length + 1);
+    };
+
+    const flushPendingLogs = async () => {
+        const pending = loadPendingLogs();
+        if (!pending || flushingLogs.current) return;
+        flushingLogs.current = true;
+        try {
+            await syncTripLogs(pending.tripId, pending.events, pending.key);
+            // Keep anything queued while the request was in flight
+            const current = loadPendingLogs();
+            const remaining = current && current.key !== pending.key ? current.events.slice(pending.events.length) : [];
+            savePendingLogs(remaining.length ? { ...current, key: newIdempotencyKey(), events: remaining } : null);
+            setPendingCount(remaining.length);
+            checkActiveTrip();
+        } catch (err) {
+            // Offline, server errors or an expired login: keep the events for the next attempt
+            const status = err.response?.status;
+            if (status === 404 || status === 409) {
+                // The trip is gone or its timeline moved on meanwhile; the server's timeline wins
+                console.error(err);
+                savePendingLogs(null);
+                setPendingCount(0);
+                setError(t('failedToLogState'));
+                checkActiveTrip();
+            }
+        } finally {
+            flushingLogs.current = false;
+        }
+    };
+
     const handleStartTrip = async () => {
         setLoading(true);
         try {
+            await flushPendingLogs();
             const trip = await startTrip();
             setActiveTrip(trip);
             setNextState('EXIT_FACTORY');
@@ -107,17 +233,8 @@ const DriverDashboard = () => {
         });
     };
 
-    const getAddressFromCoords = async (lat, lon) => {
-        try {
-            const response = await fetch(
-                `https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lon}`
-            );
-            const data = await response.json();
-            return data.display_name || null;
-        } catch (err) {
-            return null;
-        }
-    };
+    // The server replaces this placeholder with the geocoded address in the background
+    const coordsPlaceholder = (lat, lon) => `${lat.toFixed(5)}, ${lon.toFixed(5)}`;
 
     const handleLogState = async (state) => {
         setLoading(true);
@@ -126,8 +243,30 @@ const DriverDashboard = () => {
             const position = await getCurrentPosition();
             const { latitude, longitude } = position.coords;
 
-            // Step 1: Log state INSTANTLY with coordinates (driver is NOT blocked)
-            const newLog = await logTripState(activeTrip.id, state, latitude, longitude, `${latitude.toFixed(5)}, ${longitude.toFixed(5)}`);
+            const event = {
+                state,
+                latitude,
+                longitude,
+                address: coordsPlaceholder(latitude, longitude),
+                timestamp: new Date().toISOString()
+            };
+
+            // Step 1: Log state INSTANTLY with coordinates (driver is NOT blocked).
+            // Without signal, or behind events already waiting, it is queued on the phone
+            let queued = false;
+            if (loadPendingLogs()) {
+                queuePendingLog(activeTrip.id, event);
+                queued = true;
+                flushPendingLogs();
+            } else {
+                try {
+                    await logTripState(activeTrip.id, state, latitude, longitude, event.address);
+                } catch (err) {
+                    if (err.response) throw err;
+                    queuePendingLog(activeTrip.id, event);
+                    queued = true;
+                }
+            }
 
             // Step 2: Update UI state immediately — driver can proceed
             if (state === 'EXIT_FACTORY') setNextState('ARRIVE_WAREHOUSE');
@@ -140,22 +279,8 @@ const DriverDashboard = () => {
 
             setLoading(false);
 
-            // Step 3: Resolve address in background (no timeout — always completes)
-            // Then PATCH the log with the real address
-            const tripId = activeTrip?.id || newLog?.trip_id;
-            const logId = newLog?.id;
-            if (tripId && logId) {
-                getAddressFromCoords(latitude, longitude).then(address => {
-                    if (address) {
-                        updateLogAddress(tripId, logId, address).then(() => {
-                            checkActiveTrip(); // Refresh timeline with real address
-                        }).catch(err => console.error('Address patch failed:', err));
-                    }
-                });
-            }
-
-            // Refresh timeline immediately (will show coords, then update with address)
-            checkActiveTrip();
+            // Refresh timeline immediately (shows coords until the server resolves the address)
+            if (!queued) checkActiveTrip();
 
         } catch (err) {
             console.error(err);
@@ -201,7 +326,7 @@ const DriverDashboard = () => {
         try {
             const position = await getCurrentPosition();
             const { latitude, longitude } = position.coords;
-            const address = await getAddressFromCoords(latitude, longitude);
+            const address = coordsPlaceholder(latitude, longitude);
 
             await logFuelRefill(activeTrip.id, {
                 amount_liters: fuelForm.amount,
@@ -354,6 +479,12 @@ const DriverDashboard = () => {
                         </div>
                     )}
 
+                    {pendingCount > 0 && (
+                        <div className="p-3 rounded-lg w-full max-w-md text-center text-sm bg-amber-50 text-amber-700 border border-amber-200 shadow-sm">
+                            {pendingCount} {t('pendingSync')}
+                        </div>
+                    )}
+
                     {locationPermission === false && (
                         <div className="p-3 bg-yellow-100 text-yellow-800 text-sm rounded-md w-full max-w-md text-center">
                             {t('locationWarning')}
@@ -7,6 +7,8 @@ const DriverHistory = () => {
     const { t } = useLanguage();
     const [trips, setTrips] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [selectedMonth, setSelectedMonth] = useState(new Date().getMonth() + 1);
     const [selectedYear, setSelectedYear] = useState(new Date().getFullYear());
     const [expandedTrip, setExpandedTrip] = useState(null);
@@ -18,8 +20,9 @@ const DriverHistory = () => {
     const fetchHistory = async () => {
         setLoading(true);
         try {
-            const data = await getDriverHistory(selectedMonth, selectedYear);
-            setTrips(data);
+            const page = await getDriverHistory(selectedMonth, selectedYear);
+            setTrips(page.items);
+            setNextCursor(page.next_cursor);
         } catch (err) {
             console.error('Failed to fetch history:', err);
         } finally {
@@ -27,6 +30,20 @@ const DriverHistory = () => {
         }
     };
 
+    // Older trips of the selected month are fetched a page at a time
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await getDriverHistory(selectedMonth, selectedYear, nextCursor);
+            setTrips(prev => [...prev, ...page.items]);
+            setNextCursor(page.next_cursor);
+        } catch (err) {
+            console.error('Failed to fetch history:', err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const months = [
         { value: 1, label: t('january') }, { value: 2, label: t('february') },
         { value: 3, label: t('march') }, { value: 4, label: t('april') },
@@ -203,6 +220,17 @@ const DriverHistory = () => {
                         );
                     })
                 )}
+                {!loading && nextCursor && (
+                    <div className="flex justify-center pt-2">
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-4 py-2 bg-gray-100 text-gray-700 rounded-xl text-sm font-bold hover:bg-gray-200 transition disabled:opacity-50"
+                        >
+                            {loadingMore ? t('loadingTrips') : t('loadMore')}
+                        </button>
+                    </div>
+                )}
             </div>
         </div>
     );
@@ -72,6 +72,7 @@ export const translations = {
         locationDenied: "Location permission denied. Please enable GPS.",
         locationUnavailable: "Location unavailable. Check GPS signal.",
         failedToLogState: "Failed to log state. Ensure GPS is enabled.",
+        pendingSync: "step(s) saved on this phone, waiting for signal to sync",
         locationWarning: "⚠️ Location permission is required. Please check your browser settings.",
         failedToStartTrip: "Failed to start trip. Please try again.",
 
@@ -258,6 +259,7 @@ export const translations = {
         totalActual: "Total Actual (L)",
         fuelHistory: "Fuel Refill History",
         viewHistory: "View History",
+        loadMore: "Load More",
         driverName: "Driver Name",
         avgConsumption: "Avg Consumption (L/100km)",
         discrepancy: "Discrepancy (L)",
@@ -339,6 +341,7 @@ export const translations = {
         locationDenied: "تم رفض إذن الموقع. يرجى تفعيل GPS.",
         locationUnavailable: "الموقع غير متاح. تحقق من إشارة GPS.",
         failedToLogState: "فشل تسجيل الحالة. تأكد من تفعيل GPS.",
+        pendingSync: "خطوة محفوظة على الهاتف بانتظار الاتصال للمزامنة",
         locationWarning: "⚠️ إذن الموقع مطلوب. يرجى التحقق من إعدادات المتصفح.",
         failedToStartTrip: "فشل بدء الرحلة. يرجى المحاولة مرة أخرى.",
 
@@ -525,6 +528,7 @@ export const translations = {
         totalActual: "إجمالي التعبئة الفعلية (لتر)",
         fuelHistory: "سجل تعبئة الوقود",
         viewHistory: "عرض السجل",
+        loadMore: "عرض المزيد",
         driverName: "اسم السائق",
         avgConsumption: "متوسط الاستهلاك (لتر/100كم)",
         discrepancy: "الفرق (لتر)",
@@ -592,6 +596,7 @@ export const translations = {
 
         // Trip History
         loadingTrips: "سفر لوڈ ہو رہے ہیں...",
+        loadMore: "مزید لوڈ کریں",
         noTripsFound: "کوئی سفر نہیں ملا",
         noTripsMessage: "آپ نے کوئی سفر مکمل نہیں کیا",
         viewDetails: "تفصیلات دیکھیں",
@@ -606,6 +611,7 @@ export const translations = {
         locationDenied: "مقام کی اجازت مسترد۔ براہ کرم GPS فعال کریں۔",
         locationUnavailable: "مقام دستیاب نہیں۔ GPS سگنل چیک کریں۔",
         failedToLogState: "حالت لاگ کرنے میں ناکام۔ یقینی بنائیں کہ GPS فعال ہے۔",
+        pendingSync: "مرحلے اس فون پر محفوظ ہیں، سنک کے لیے سگنل کا انتظار",
         locationWarning: "⚠️ مقام کی اجازت درکار ہے۔ براہ کرم اپنے براؤزر کی ترتیبات چیک کریں۔",
         failedToStartTrip: "سفر شروع کرنے میں ناکام۔ براہ کرم دوبارہ کوشش کریں۔",
 
@@ -679,6 +685,7 @@ export const translations = {
 
         // Trip History
         loadingTrips: "यात्राएं लोड हो रही हैं...",
+        loadMore: "और लोड करें",
         noTripsFound: "कोई यात्रा नहीं मिली",
         noTripsMessage: "आपने कोई यात्रा पूरी नहीं की",
         viewDetails: "विवरण देखें",
@@ -693,6 +700,7 @@ export const translations = {
         locationDenied: "स्थान अनुमति अस्वीकृत। कृपया GPS सक्षम करें।",
         locationUnavailable: "स्थान अनुपलब्ध। GPS सिग्नल जांचें।",
         failedToLogState: "स्थिति लॉग करने में विफल। सुनिश्चित करें कि GPS सक्षम है।",
+        pendingSync: "चरण इस फ़ोन पर सहेजे गए, सिंक के लिए सिग्नल की प्रतीक्षा",
         locationWarning: "⚠️ स्थान अनुमति आवश्यक है। कृपया अपनी ब्राउज़र सेटिंग जांचें।",
         failedToStartTrip: "यात्रा शुरू करने में विफल। कृपया पुन: प्रयास करें।",
 